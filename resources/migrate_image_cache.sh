@@ -0,0 +1,5 @@
+#!/bin/bash
+
+# converts album art cached by older versions into the compressed storage format
+cd ../src
+../venv/bin/python -c "from DataManagers.AlbumArtCache import AlbumArtCache; cache = AlbumArtCache(None); print(f'converted {cache.migrate()} albums'); cache.close()"
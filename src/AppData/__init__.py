@@ -8,11 +8,21 @@ FPS = 30  # how often to update music menu
 
 # audio playback settings
 MAX_VOLUME = 100  # might take some adjusting based on cars sound system
-MAX_CACHED_ALBUMS = 90_000  # around 90 gb with 512 resolution, feel free to adjust if needed
+MAX_CACHED_ALBUMS = 90_000  # around 5 gb with 512 resolution webp images (90 gb if stored as raw images by older versions), feel free to adjust if needed
+PREFETCH_TRACKS = 5  # how many upcoming tracks in the phones play queue get their album art loaded ahead of time, 0 to disable
+MUSIC_LIBRARY = None  # a directory of music files (for example "~/Music") to read album art from when offline, None to disable
+ALBUM_ART_MEMORY = 64  # megabytes of decoded album art kept in memory for instant access to recently shown albums (about 1 mb per album with 512 resolution)
 
 # image resolutions
 ALBUM_ART_RESOLUTION = 512  # can be adjusted to change the quality of the album art, but will change the size of the image cache
 MAP_TILE_RESOLUTION = 256  # changes how big the map tiles are
+IMAGE_PROCESSES = 0  # number of extra processes used to format downloaded album art, 0 formats in the background threads instead
+ALBUM_ART_FORMAT = "WEBP"  # the format album art is compressed to in the image cache, either "WEBP" (smallest) or "PNG" (lossless)
+
+# network settings for online apis (spotify, github releases)
+NETWORK_TIMEOUT = 5  # seconds to wait for a server response before giving up
+NETWORK_RETRIES = 2  # how many times a failed connection or server error is retried, increase if your hotspot connection is unreliable
+ASYNC_NETWORK = False  # sends requests from a single asyncio thread instead of one thread per request, requires the aiohttp module
 
 # default map view when no gps connection
 INITIAL_MAP_COORDS = [39.8283, -98.5795]
@@ -25,6 +35,31 @@ MILE_DELTAS = {
     "change_transmission_at": 75_000,
 }
 TANK_CAPACITY = 18.5  # the maximum capacity of your cars gas tank in gallons
+AIR_FUEL_RATIO = 14.7  # grams of air burned per gram of fuel, 14.7 for gasoline (around 9.8 for E85)
+FUEL_DENSITY = 6.17  # pounds per gallon of fuel, 6.17 for gasoline (around 6.6 for E85)
+
+# obd pids to read and how many times per second to read each, names are python-OBD command names. SPEED, MAF and FUEL_LEVEL are needed for fuel economy
+OBD_PIDS = {
+    "SPEED": 10,
+    "MAF": 10,
+    "RPM": 5,
+    "FUEL_LEVEL": .5,
+    "COOLANT_TEMP": .2,
+    "THROTTLE_POS": 5,
+    "INTAKE_TEMP": .2,
+    "CONTROL_MODULE_VOLTAGE": .5,
+}
+
+# gauges shown in the obd menu where key is the python-OBD command name and value is [label, minimum, maximum, unit] of the dial
+# pids not in OBD_PIDS are read once per second while connected
+OBD_GAUGES = {
+    "RPM": ["RPM", 0, 6000, "rpm"],
+    "SPEED": ["Speed", 0, 120, "mph"],
+    "COOLANT_TEMP": ["Coolant", -40, 130, "°C"],
+    "THROTTLE_POS": ["Throttle", 0, 100, "%"],
+    "INTAKE_TEMP": ["Intake", -40, 100, "°C"],
+    "CONTROL_MODULE_VOLTAGE": ["Battery", 8, 16, "V"],
+}
 
 # apps - add as many as you'd like key is app name value is app settings (see example)
 APPS = {
@@ -51,12 +86,24 @@ try:
         FPS = settings["screen"]["fps"]
         MAX_VOLUME = settings["audio"]["max_volume"]
         MAX_CACHED_ALBUMS = settings["audio"]["max_cached_albums"]
+        PREFETCH_TRACKS = settings["audio"]["prefetch_tracks"]
+        MUSIC_LIBRARY = settings["audio"]["music_library"]
+        ALBUM_ART_MEMORY = settings["audio"]["album_art_memory"]
         ALBUM_ART_RESOLUTION = settings["image"]["album_art_resolution"]
         MAP_TILE_RESOLUTION = settings["image"]["map_tile_resolution"]
+        IMAGE_PROCESSES = settings["image"]["image_processes"]
+        ALBUM_ART_FORMAT = settings["image"]["album_art_format"]
+        NETWORK_TIMEOUT = settings["network"]["timeout"]
+        NETWORK_RETRIES = settings["network"]["retries"]
+        ASYNC_NETWORK = settings["network"]["async_backend"]
         INITIAL_MAP_COORDS = settings["map"]["initial_coords"]
         INITIAL_MAP_ZOOM = settings["map"]["initial_zoom"]
         MILE_DELTAS = settings["maintenance"]["mile_deltas"]
         TANK_CAPACITY = settings["maintenance"]["tank_capacity"]
+        AIR_FUEL_RATIO = settings["maintenance"]["air_fuel_ratio"]
+        FUEL_DENSITY = settings["maintenance"]["fuel_density"]
+        OBD_PIDS = settings["obd"]["pids"]
+        OBD_GAUGES = settings["obd"]["gauges"]
         APPS = settings["apps"]
         PIN = settings["security"]["pin"]
         SECURITY_LEVEL = settings["security"]["security_level"]
@@ -73,10 +120,20 @@ except:
             "audio": {
                 "max_volume": MAX_VOLUME,
                 "max_cached_albums": MAX_CACHED_ALBUMS,
+                "prefetch_tracks": PREFETCH_TRACKS,
+                "music_library": MUSIC_LIBRARY,
+                "album_art_memory": ALBUM_ART_MEMORY,
             },
             "image": {
                 "album_art_resolution": ALBUM_ART_RESOLUTION,
                 "map_tile_resolution": MAP_TILE_RESOLUTION,
+                "image_processes": IMAGE_PROCESSES,
+                "album_art_format": ALBUM_ART_FORMAT,
+            },
+            "network": {
+                "timeout": NETWORK_TIMEOUT,
+                "retries": NETWORK_RETRIES,
+                "async_backend": ASYNC_NETWORK,
             },
             "map": {
                 "initial_coords": INITIAL_MAP_COORDS,
@@ -85,6 +142,12 @@ except:
             "maintenance": {
                 "mile_deltas": MILE_DELTAS,
                 "tank_capacity": TANK_CAPACITY,
+                "air_fuel_ratio": AIR_FUEL_RATIO,
+                "fuel_density": FUEL_DENSITY,
+            },
+            "obd": {
+                "pids": OBD_PIDS,
+                "gauges": OBD_GAUGES,
             },
             "apps": APPS,
             "security": {
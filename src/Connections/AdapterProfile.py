@@ -0,0 +1,188 @@
+from json import load, dump
+from time import sleep, strftime, localtime
+
+
+class AdapterProfile:
+    """
+    a class to probe the capabilities of an ELM327 compatible adapter and tune its link for throughput:
+        -> a faster serial baud rate, STBR on STN chips and AT BRD on ELM chips
+        -> aggressive adaptive timing (AT AT2) so the adapter stops waiting for slow ecus sooner
+        -> spaces off (AT S0) so each response is about a third shorter
+        -> multi pid requests, tested by the OBDAPI benchmark
+
+    the discovered profile is saved per adapter in AppData/obd_profiles.json so later connects apply it without probing
+    """
+
+    PATH = "AppData/obd_profiles.json"
+    VIRTUAL_PORTS = ("/dev/rfcomm", "/dev/pts")  # bluetooth and pseudo terminals ignore the baud rate
+    STN_BAUDS = (1000000, 500000, 230400, 115200)
+    ELM_BAUDS = (500000, 230400, 115200)
+    ELM_CLOCK = 4000000  # AT BRD takes the divisor of this clock
+    SWITCH_TIMEOUT = .5  # seconds to wait for each step of a baud rate switch
+
+    def __init__(self, interface):
+        """
+        initializes the profile of a connected adapter
+
+        @param interface: the python-OBD ELM327 interface of the connection
+        """
+
+        self.interface = interface
+        self.port = interface._ELM327__port
+        self.key = None
+        self.stn = False
+
+    def send(self, command):
+        """
+        sends an AT or ST command to the adapter
+
+        @param command: the command to send, ie b"ATI"
+
+        @return the lines of the response
+        """
+
+        return self.interface._ELM327__send(command)
+
+    def identify(self):
+        """
+        identifies the adapter by its port and chip version, STN chips answer STI while ELM chips answer ?
+
+        @return the key of the adapter in the profiles file
+        """
+
+        elm = " ".join(self.send(b"ATI"))
+        stn = " ".join(self.send(b"STI"))
+        self.stn = stn.startswith("STN")
+        self.key = f"{self.interface.port_name()}|{elm}|{stn if self.stn else ''}"
+        return self.key
+
+    @staticmethod
+    def load_profiles():
+        """
+        @return a dictionary of every adapter key to its saved profile
+        """
+
+        try:
+            with open(AdapterProfile.PATH, "r") as f:
+                return load(f)
+        except:
+            return {}
+
+    def load(self):
+        """
+        @return the saved profile of the adapter or None if it has not been probed
+        """
+
+        return AdapterProfile.load_profiles().get(self.key)
+
+    def save(self, profile):
+        """
+        saves the profile of the adapter to the profiles file
+
+        @param profile: the profile to save
+        """
+
+        profiles = AdapterProfile.load_profiles()
+        profiles[self.key] = {**profile, "probed": strftime("%Y-%m-%d %H:%M:%S", localtime())}
+        with open(AdapterProfile.PATH, "w") as f:
+            dump(profiles, f, indent=4)
+
+    def is_ok(self, command):
+        """
+        @param command: the command to send
+
+        @return if the adapter answered OK
+        """
+
+        return "OK" in self.send(command)
+
+    def probe(self):
+        """
+        probes the link settings of the adapter, multi pid requests are left for the caller to benchmark
+
+        @return the profile of the adapter
+        """
+
+        return {
+            "adaptive_timing": self.is_ok(b"ATAT2"),
+            "spaces_off": self.is_ok(b"ATS0"),
+            "baudrate": self.upgrade_baudrate()
+        }
+
+    def apply(self, profile):
+        """
+        applies a saved profile to the adapter
+
+        @param profile: the profile to apply
+
+        @return if every setting of the profile was applied, if not the adapter should be probed again
+        """
+
+        applied = True
+        if profile.get("adaptive_timing"):
+            applied &= self.is_ok(b"ATAT2")
+        if profile.get("spaces_off"):
+            applied &= self.is_ok(b"ATS0")
+        if (baudrate := profile.get("baudrate")) and baudrate != self.port.baudrate:
+            applied &= self.switch_baudrate(baudrate)
+        return applied
+
+    def upgrade_baudrate(self):
+        """
+        switches to the fastest baud rate the adapter and serial port both handle
+
+        @return the baud rate of the link
+        """
+
+        if self.interface.port_name().startswith(AdapterProfile.VIRTUAL_PORTS):
+            return self.port.baudrate
+        for baudrate in AdapterProfile.STN_BAUDS if self.stn else AdapterProfile.ELM_BAUDS:
+            if baudrate <= self.port.baudrate:
+                break
+            if self.switch_baudrate(baudrate):
+                break
+        return self.port.baudrate
+
+    def switch_baudrate(self, baudrate):
+        """
+        switches the baud rate of the adapter for this session. the adapter answers OK at the old rate,
+        sends its id at the new rate and keeps the new rate only if the host answers with a carriage return,
+        otherwise it returns to the old rate on its own. PP 0C is not used since it changes the rate permanently
+
+        @param baudrate: the baud rate to switch to
+
+        @return if the baud rate was switched
+        """
+
+        old, timeout = self.port.baudrate, self.port.timeout
+        command = f"STBR {baudrate}" if self.stn else f"ATBRD {round(AdapterProfile.ELM_CLOCK / baudrate):02X}"
+        try:
+            self.port.timeout = AdapterProfile.SWITCH_TIMEOUT
+            self.port.reset_input_buffer()
+            self.port.write(command.encode() + b"\r")
+            self.port.flush()
+            if b"OK" not in self.port.read_until(b"OK"):
+                return False
+
+            # waits for the id at the new rate and confirms it
+            self.port.baudrate = baudrate
+            for _ in range(2):
+                if self.port.read_until(b"\r").strip(b"\r\n >"):
+                    self.port.write(b"\r")
+                    self.port.flush()
+                    if self.port.read_until(b">").endswith(b">"):
+                        return True
+                    break
+
+            # the adapter returns to the old rate after the timeout
+            self.port.baudrate = old
+            sleep(AdapterProfile.SWITCH_TIMEOUT)
+            self.port.reset_input_buffer()
+            return False
+
+        except:
+            self.port.baudrate = old
+            return False
+
+        finally:
+            self.port.timeout = timeout
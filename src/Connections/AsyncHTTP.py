@@ -0,0 +1,188 @@
+from AppData import NETWORK_TIMEOUT, NETWORK_RETRIES, ASYNC_NETWORK
+from Connections.HTTPSession import HTTPSession
+from asyncio import new_event_loop, run_coroutine_threadsafe, sleep
+from threading import Thread, Lock
+from time import perf_counter
+
+
+class AsyncHTTP:
+    """
+    a class to send http requests from a single asyncio event loop thread with aiohttp.
+    waiting on a response does not occupy a thread so any number of requests can be in flight at once,
+    requests are submitted as coroutines and returned as concurrent futures so callers keep using done callbacks
+
+    shares the rate limits, retry policy and latency histograms of HTTPSession and is only used when
+    the async_backend network setting is enabled and the optional aiohttp module is installed
+    """
+
+    CHUNK_SIZE = 16_384  # how many bytes of a cancellable response are read between cancellation checks
+
+    # class fields
+    enabled = None
+    loop = None
+    sessions = {}
+    lock = Lock()
+
+    @classmethod
+    def available(cls):
+        """
+        @return if the async backend is enabled and aiohttp is installed
+        """
+
+        if cls.enabled is None:
+            try:
+                import aiohttp  # lazy loaded for performance
+                cls.enabled = ASYNC_NETWORK
+            except ModuleNotFoundError:
+                cls.enabled = False
+        return cls.enabled
+
+    @classmethod
+    def get_loop(cls):
+        """
+        gets the event loop, starting its thread if needed
+
+        @return the event loop
+        """
+
+        with cls.lock:
+            if cls.loop is None:
+                cls.loop = new_event_loop()
+                Thread(target=cls.loop.run_forever, daemon=True).start()
+            return cls.loop
+
+    @classmethod
+    def submit(cls, coroutine):
+        """
+        runs a coroutine on the event loop thread
+
+        @param coroutine: the coroutine to run
+
+        @return a concurrent future object to access the result of the coroutine when completed
+        """
+
+        return run_coroutine_threadsafe(coroutine, cls.get_loop())
+
+    @classmethod
+    def run(cls, coroutine):
+        """
+        runs a coroutine on the event loop thread and waits for it to finish
+
+        @param coroutine: the coroutine to run
+
+        @return the result of the coroutine
+        """
+
+        return cls.submit(coroutine).result()
+
+    @classmethod
+    def get_session(cls, name):
+        """
+        gets a named session, creating it if needed. must be called from the event loop thread
+
+        @param name: the name of the session, usually the api using it
+
+        @return the session
+        """
+
+        if name not in cls.sessions:
+            from aiohttp import ClientSession, TCPConnector  # lazy loaded for performance
+            cls.sessions[name] = ClientSession(connector=TCPConnector(limit_per_host=HTTPSession.POOL_SIZE))
+        return cls.sessions[name]
+
+    @classmethod
+    async def request(cls, name, method, url, endpoint=None, timeout=NETWORK_TIMEOUT, cancel=None, **kwargs):
+        """
+        sends a request through a named session, waiting for the rate limit of the session if it has one.
+        connection errors and server errors are retried the same as HTTPSession
+
+        @param name: the name of the session to send the request through
+        @param method: the http method of the request
+        @param url: the url to send the request to
+        @param endpoint: the name to record the latency and errors of the request under, defaults to the host
+        @param timeout: the seconds to wait to connect and between bytes of the response
+        @param cancel: an event that is set when the response is no longer needed, checked before sending and while reading the body
+        @param kwargs: additional keyword arguments for the aiohttp request
+
+        @return a tuple of the status code, headers and body of the response, the body is None if the request was cancelled
+
+        @raise TimeoutError: if the rate limit would delay the request longer than the network timeout
+        """
+
+        from aiohttp import ClientTimeout  # lazy loaded for performance
+        endpoint = f"{name}/{endpoint or url.split('/')[2]}"
+
+        # waits for the rate limit without blocking the event loop
+        limiter = HTTPSession.limiters.get(name)
+        if limiter:
+            if (delay := limiter.reserve(NETWORK_TIMEOUT)) is None:
+                HTTPSession.record(endpoint, None, "rate limited")
+                raise TimeoutError(f"{endpoint} is rate limited")
+            await sleep(delay)
+
+        # sends the request, retrying connection and server errors
+        for attempt in range(NETWORK_RETRIES + 1):
+            if cancel and cancel.is_set():
+                return None, None, None
+            start = perf_counter()
+            try:
+                async with cls.get_session(name).request(method, url, timeout=ClientTimeout(sock_connect=timeout, sock_read=timeout), **kwargs) as response:
+                    if (body := await cls.read(response, cancel)) is None:
+                        return response.status, response.headers, None  # leaving a partly read response drops the connection
+            except Exception as e:
+                HTTPSession.record(endpoint, perf_counter() - start, type(e).__name__)
+                if attempt == NETWORK_RETRIES:
+                    raise
+            else:
+                HTTPSession.record(endpoint, perf_counter() - start, response.status if response.status >= 400 else None)
+                if response.status not in HTTPSession.RETRY_STATUSES or attempt == NETWORK_RETRIES:
+                    break
+            await sleep(HTTPSession.RETRY_BACKOFF * 2 ** attempt)
+
+        # pauses every request of the session when throttled
+        if response.status == 429 and limiter:
+            limiter.pause(HTTPSession.retry_after(response))
+        return response.status, response.headers, body
+
+    @classmethod
+    async def read(cls, response, cancel=None):
+        """
+        reads the body of a response, in chunks when it can be cancelled so it can be aborted part way through
+
+        @param response: the aiohttp response
+        @param cancel: an event that is set when the body is no longer needed
+
+        @return the body or None if it was cancelled
+        """
+
+        if cancel is None:
+            return await response.read()
+        body = bytearray()
+        async for chunk in response.content.iter_chunked(cls.CHUNK_SIZE):
+            if cancel.is_set():
+                return None
+            body += chunk
+        return bytes(body)
+
+    @classmethod
+    def close(cls):
+        """
+        closes all the sessions and stops the event loop thread
+        """
+
+        with cls.lock:
+            if cls.loop is None:
+                return
+
+            # closes the sessions on the loop they were created on
+            async def close_sessions():
+                for session in cls.sessions.values():
+                    await session.close()
+                cls.sessions = {}
+
+            try:
+                run_coroutine_threadsafe(close_sessions(), cls.loop).result(NETWORK_TIMEOUT)
+            except:
+                pass
+            cls.loop.call_soon_threadsafe(cls.loop.stop)
+            cls.loop = None
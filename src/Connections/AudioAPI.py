@@ -4,6 +4,7 @@ from threading import Thread
 from contextlib import redirect_stdout
 from io import StringIO
 from playsound import playsound
+from AppData import PREFETCH_TRACKS
 try:
     from Lib.BluezAgent import my_app as start_bluetooth
     from pydbus import SystemBus
@@ -49,6 +50,7 @@ class AudioAPI:
         self.art_job = self.art_manager.queue_album_art_job(self.title, self.artist, self.album)
         self.art_job.result()
         self.last_property_params = None
+        self.art_manager.queue_prefetch_job(self.upcoming_tracks, PREFETCH_TRACKS)
 
         # sets listener for track change
         self.bus.subscribe(
@@ -67,6 +69,36 @@ class AudioAPI:
         if "Track" in params and self.last_property_params != (params["Track"]["Title"], params["Track"]["Artist"]):
             self.last_property_params = (params["Track"]["Title"], params["Track"]["Artist"])
             self.art_job = self.art_manager.queue_album_art_job(self.title, self.artist, self.album)
+            self.art_manager.queue_prefetch_job(self.upcoming_tracks, PREFETCH_TRACKS)
+
+    def upcoming_tracks(self, count):
+        """
+        reads the tracks queued after the current track from the players now playing list.
+        only works with devices that support bluetooth browsing and have already listed the play queue,
+        the queue is never listed here since that would change the browsing folder of the phone
+
+        @param count: the maximum number of tracks to read
+
+        @return a list of (title, artist, album) tuples, empty if the play queue can not be read
+        """
+
+        try:
+            playlist = self.player.Playlist
+            mngr = self.bus.get("org.bluez", "/")
+            items = [
+                (path, interfaces["org.bluez.MediaItem1"]) for path, interfaces in mngr.GetManagedObjects().items()
+                if "org.bluez.MediaItem1" in interfaces and path.startswith(f"{playlist}/")
+            ]
+            items.sort(key=lambda item: int("".join(c for c in item[0].rsplit("/", 1)[-1] if c.isdigit()) or 0))
+
+            # finds the tracks after the current track
+            tracks = [(item["Metadata"].get("Title"), item["Metadata"].get("Artist"), item["Metadata"].get("Album")) for _, item in items if "Metadata" in item]
+            current = next((i for i, track in enumerate(tracks) if track[:2] == (self._title, self._artist)), -1)
+            return tracks[current + 1:current + 1 + count]
+
+        # player does not support browsing
+        except:
+            return []
 
     def update_player(self):
         """
@@ -208,7 +240,7 @@ class AudioAPI:
     def album_art(self):
         """
         attempts to get the album art of the current track.
-        only retrieves the art if the queued job has completed
+        only retrieves the art if the queued job has completed and was not cancelled by a newer job
         additionally this method will only return the art for
         the current track once to avoid repeat calling the expensive job
 
@@ -216,7 +248,7 @@ class AudioAPI:
         """
 
         art = None
-        if self.art_job and self.art_job.done():
+        if self.art_job and self.art_job.done() and not self.art_job.cancelled():
             art = self.art_job.result()
             self.art_job = None
         return art
@@ -0,0 +1,181 @@
+from AppData import NETWORK_TIMEOUT, NETWORK_RETRIES
+from Connections.RateLimiter import RateLimiter
+from threading import Lock
+from time import perf_counter
+from bisect import bisect_left
+
+
+class HTTPSession:
+    """
+    a class to share pooled http sessions between the api connectors.
+    each named session keeps its connections alive so repeated requests to the
+    same host reuse one connection instead of performing a new tls handshake every time.
+    sessions are safe to share between the job manager threads
+
+    sessions with a rate limit share one token bucket across every thread and pause
+    all of their requests when the api responds with 429, honoring its Retry-After header.
+    the latency and errors of each endpoint are recorded in histograms
+    """
+
+    POOL_SIZE = 10  # connections kept alive per host, should be at least the number of threads making requests
+    RETRY_BACKOFF = .5  # seconds to wait before the first retry, doubled for each retry
+    RETRY_STATUSES = (500, 502, 503, 504)  # 429 is not retried here since it pauses the whole session
+    RATE_LIMITS = {"spotify": (5, 10)}  # session name: (requests per second, burst size)
+    DEFAULT_RETRY_AFTER = 30  # seconds to pause for when a 429 response has no Retry-After header
+    LATENCY_BUCKETS = (50, 100, 250, 500, 1000, 2500, 5000)  # upper bounds in milliseconds, the last bucket is unbounded
+
+    # class fields
+    sessions = {}
+    limiters = {name: RateLimiter(*limit) for name, limit in RATE_LIMITS.items()}
+    histograms = {}
+    lock = Lock()
+
+    @classmethod
+    def get_session(cls, name):
+        """
+        gets a named session, creating it if needed
+
+        @param name: the name of the session, usually the api using it
+
+        @return the session
+        """
+
+        with cls.lock:
+            if name in cls.sessions:
+                return cls.sessions[name]
+
+            # lazy loaded for performance
+            from requests import Session
+            from requests.adapters import HTTPAdapter
+            from urllib3.util.retry import Retry
+
+            # creates the session with connection pooling and retries
+            retry = Retry(
+                total=NETWORK_RETRIES,
+                backoff_factor=cls.RETRY_BACKOFF,
+                status_forcelist=cls.RETRY_STATUSES,
+                allowed_methods=None,  # spotify token requests are safe to retry
+                respect_retry_after_header=False,
+                raise_on_status=False
+            )
+            adapter = HTTPAdapter(pool_connections=cls.POOL_SIZE, pool_maxsize=cls.POOL_SIZE, max_retries=retry)
+            session = Session()
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            cls.sessions[name] = session
+            return session
+
+    @classmethod
+    def request(cls, name, method, url, endpoint=None, cancel=None, **kwargs):
+        """
+        sends a request through a named session, waiting for the rate limit of the session if it has one
+
+        @param name: the name of the session to send the request through
+        @param method: the http method of the request
+        @param url: the url to send the request to
+        @param endpoint: the name to record the latency and errors of the request under, defaults to the host
+        @param cancel: an event that is set when the request is no longer needed, checked while waiting for the rate limit
+        @param kwargs: additional keyword arguments for the request, timeout defaults to the configured network timeout
+
+        @return the response
+
+        @raise TimeoutError: if the rate limit would delay the request longer than the timeout or the request was cancelled
+        """
+
+        kwargs.setdefault("timeout", NETWORK_TIMEOUT)
+        endpoint = f"{name}/{endpoint or url.split('/')[2]}"
+
+        # waits for the rate limit
+        limiter = cls.limiters.get(name)
+        if limiter and not limiter.acquire(NETWORK_TIMEOUT, cancel):
+            cls.record(endpoint, None, "rate limited")
+            raise TimeoutError(f"{endpoint} is rate limited")
+
+        # sends the request
+        start = perf_counter()
+        try:
+            response = cls.get_session(name).request(method, url, **kwargs)
+        except Exception as e:
+            cls.record(endpoint, perf_counter() - start, type(e).__name__)
+            raise
+        cls.record(endpoint, perf_counter() - start, response.status_code if response.status_code >= 400 else None)
+
+        # pauses every request of the session when throttled
+        if response.status_code == 429 and limiter:
+            limiter.pause(cls.retry_after(response))
+        return response
+
+    @classmethod
+    def retry_after(cls, response):
+        """
+        @param response: a 429 response
+
+        @return the number of seconds to wait from the Retry-After header, which can be seconds or a date
+        """
+
+        value = response.headers.get("Retry-After")
+        try:
+            return max(0, float(value))
+        except:
+            pass
+
+        # lazy loaded for performance
+        try:
+            from email.utils import parsedate_to_datetime
+            from datetime import datetime, timezone
+            return max(0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+        except:
+            return cls.DEFAULT_RETRY_AFTER
+
+    @classmethod
+    def limited(cls, name):
+        """
+        @param name: the name of the session
+
+        @return if the session is paused because its api responded with 429
+        """
+
+        return name in cls.limiters and cls.limiters[name].paused
+
+    @classmethod
+    def record(cls, endpoint, latency, error):
+        """
+        records a request in the histograms of its endpoint
+
+        @param endpoint: the name of the endpoint
+        @param latency: the seconds the request took or None if it was not sent
+        @param error: the status code or exception name of a failed request or None if it succeeded
+        """
+
+        with cls.lock:
+            histogram = cls.histograms.setdefault(endpoint, {"latency": [0] * (len(cls.LATENCY_BUCKETS) + 1), "errors": {}})
+            if latency is not None:
+                histogram["latency"][bisect_left(cls.LATENCY_BUCKETS, latency * 1000)] += 1
+            if error is not None:
+                histogram["errors"][error] = histogram["errors"].get(error, 0) + 1
+
+    @classmethod
+    def metrics(cls):
+        """
+        @return a dictionary of each endpoint to its latency histogram and error counts,
+            and each rate limited session to its rate limit metrics
+        """
+
+        labels = [f"<={bound}ms" for bound in cls.LATENCY_BUCKETS] + [f">{cls.LATENCY_BUCKETS[-1]}ms"]
+        with cls.lock:
+            endpoints = {
+                endpoint: {"latency": dict(zip(labels, histogram["latency"])), "errors": dict(histogram["errors"])}
+                for endpoint, histogram in cls.histograms.items()
+            }
+        return {"endpoints": endpoints, "rate_limits": {name: limiter.metrics for name, limiter in cls.limiters.items()}}
+
+    @classmethod
+    def close(cls):
+        """
+        closes all the sessions and their connections
+        """
+
+        with cls.lock:
+            for session in cls.sessions.values():
+                session.close()
+            cls.sessions = {}
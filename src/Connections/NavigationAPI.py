@@ -4,7 +4,7 @@ from threading import Thread
 from sys import argv
 from time import sleep
 from math import atan2, degrees
-from json import load, dump
+from json import load, dump, loads
 try:
     from bmm150 import BMM150, PresetMode
 except ModuleNotFoundError:
@@ -167,6 +167,67 @@ class NavigationAPI:
         except:
             pass
 
+    @staticmethod
+    async def geocode_async(query):
+        """
+        the same as geocode but sent from the asyncio thread so no thread waits on the response
+
+        @param query: the point of interest get the coordinates of
+
+        @return: the json result of the query
+        """
+
+        from Connections.AsyncHTTP import AsyncHTTP  # lazy loaded for performance
+        try:
+            _, _, body = await AsyncHTTP.request(
+                "nominatim",
+                "GET",
+                NavigationAPI.NOMINATIM_URL,
+                params={
+                    "q": query,
+                    "format": "jsonv2",
+                },
+                headers={
+                    "User-Agent": "4RunnerDash"
+                },
+                timeout=15
+            )
+            results = loads(body)
+            return "Error Processing Request, Try Again..." if "error" in results or isinstance(results, dict) else results
+
+        # handles errors
+        except:
+            return "Error Processing Request, Try Again..."
+
+    @classmethod
+    async def navigate_async(cls, point):
+        """
+        the same as navigate but sent from the asyncio thread so no thread waits on the response
+
+        @param point: the ending point
+
+        @return: the json response from GraphHopper
+        """
+
+        from Connections.AsyncHTTP import AsyncHTTP  # lazy loaded for performance
+        try:
+            _, _, body = await AsyncHTTP.request(
+                "graphhopper",
+                "GET",
+                NavigationAPI.GRAPH_HOPPER_URL,
+                params=[
+                    ("point", f"{cls.gps_coords[0]},{cls.gps_coords[1]}"),
+                    ("point", f"{point[0]},{point[1]}"),
+                    ("profile", "car"),
+                    ("points_encoded", "false")
+                ],
+                timeout=15
+            )
+            return loads(body)["paths"][0]
+
+        except:
+            pass
+
     @classmethod
     def add_gps_callback(cls, callback):
         """
@@ -1,102 +1,360 @@
-from obd import Async, commands
+from obd import Async, OBDStatus, OBDCommand, ECU, commands
+from obd.decoders import dtc, parse_dtc
 from DataManagers.MileManager import MileManger
-from AppData import TANK_CAPACITY
-from logging import disable, CRITICAL
+from DataManagers.TripRecorder import TripRecorder
+from DataManagers.FuelEconomy import FuelEconomy
+from DataManagers.DTCHistory import DTCHistory
+from DataManagers.DTCDescriptions import DTCDescriptions
+from Connections.AdapterProfile import AdapterProfile
+from AppData import OBD_PIDS, OBD_GAUGES
+from logging import getLogger, CRITICAL, DEBUG
+from time import time, monotonic, sleep
+from threading import Lock, Event
+from copy import copy
 
 
 class OBDAPI(Async):
     """
     a class to communicate with the OBD-II interface of a vehicle.
+
+    pids are read by a scheduler instead of in a fixed loop, each pid is read at its own target rate from the app settings
+    and pids that are due at the same time are requested together (up to 6 per request) when the adapter supports it.
+    the adapter link is tuned on the first connect and the profile is reused on later connects
     """
 
-    # disables obd logging
-    disable(CRITICAL)
+    # disables obd logging, only the python-OBD loggers so the app can still write to the debug log
+    getLogger("obd").setLevel(CRITICAL + 1)
+
+    UPDATE_INTERVAL = 1  # seconds between fuel economy updates sent to the UI
+    MAX_BATCH = 6  # the most pids the OBD-II standard allows in one request
+    IDLE_SLEEP = .25  # seconds to wait when no pids are being read
+    BENCHMARK_TIME = 2  # seconds to read pids for when benchmarking the adapter
+    CAR_OFF_TIMEOUT = 3  # seconds without any pid answering before the car is treated as turned off
+    GAUGE_RATE = 1  # reads per second of gauge pids that are not in the obd pids setting
+
+    # diagnostics
+    PERMANENT_DTC = OBDCommand("GET_PERMANENT_DTC", "Get Permanent DTCs", b"0A", 0, dtc, ECU.ALL, False)  # mode 0A is missing from python-OBD
+    FREEZE_FRAME = ("ENGINE_LOAD", "COOLANT_TEMP", "SHORT_FUEL_TRIM_1", "LONG_FUEL_TRIM_1", "INTAKE_PRESSURE", "RPM", "SPEED", "INTAKE_TEMP", "MAF", "THROTTLE_POS")
+    MAX_FREEZE_BATCH = 3  # the most pids the OBD-II standard allows in one freeze frame request
 
-    def __init__(self, root, job_manager, mpg, miles_until_empty):
+    def __init__(self, root, job_manager, snapshot):
         """
         initializes the OBDAPI class.
 
         @param root: the root window to update to prevent deadlocks
         @param job_manager: handles connecting to the OBD interface in background threads
-        @param mpg: the callback function for updating the mpg
-        @param miles_until_empty: the callback function for updating miles until empty
-            ** note: all of these callbacks take 1 parameter for the new value **
+        @param snapshot: the snapshot store the latest values are published to for the UI to poll:
+            -> the value of each pid read, by the name of the pid
+            -> mpg: the mpg over the last minute
+            -> trip_mpg: the mpg over the trip
+            -> miles_until_empty: the miles until empty
         """
 
         # initializes fields
         self.root = root
         self.job_manager = job_manager
-        self.mpg = mpg
-        self.miles_until_empty = miles_until_empty
-        self.speed_time = None
-        self.job_manager.queue_obd_connection_job(self, root)
+        self.snapshot = snapshot
+        self.last_update = time()
+        self.trip = TripRecorder()
+        self.economy = FuelEconomy(self.trip)
+        self.schedule = {}  # command: seconds between reads
+        self.multi_pid = None  # whether the adapter answers several pids in one request, None until tested
+        self.reads = {}
+        self.requests = 0
+        self.schedule_start = monotonic()
+        self.link_lock = Lock()  # held for each request so diagnostics can take over the adapter between requests
+        self.link_free = Event()  # cleared while diagnostics wait for the link so the read loop hands it over
+        self.link_free.set()
+        self.dtc_history = DTCHistory()
+        self.job_manager.queue_obd_connection_job(self)
 
-    def update_loop(self):
+    def watch_schedule(self):
         """
-        main update loop for the OBD-II interface.
-        This method should be registered after all other commands are registered
-        to ensure all commands are processed before this one.
+        watches the pids and gauges from the app settings that the car supports, must be called after connecting
         """
 
-        # gets the values
-        speed = self.query(commands.SPEED)
-        maf = self.query(commands.MAF)
-        fuel_level = self.query(commands.FUEL_LEVEL)
+        self.schedule = {}
+        for name, rate in {**{name: OBDAPI.GAUGE_RATE for name in OBD_GAUGES}, **OBD_PIDS}.items():
+            command = getattr(commands, name, None)
+            if command is not None and rate > 0 and self.supports(command):
+                self.watch(command)  # lets query return the latest response
+                self.schedule[command] = 1 / rate
+        self.reads = {command.name: 0 for command in self.schedule}
+        self.requests = 0
+        self.schedule_start = monotonic()
+
+    def tune_adapter(self):
+        """
+        tunes the adapter link, must be called after watching the schedule and before starting the read thread.
+        a new adapter is probed and benchmarked before and after, a known adapter has its saved profile applied
+        """
 
-        # handles the first response
-        if self.speed_time is None:
-            self.speed_time = speed.time
+        if not self.is_connected():
             return
-        
-        # updates the speed and calculates the time delta
-        dt = speed.time - self.speed_time
-        self.speed_time = speed.time
+        try:
+            profile = AdapterProfile(self.interface)
+            profile.identify()
 
-        # calculates required values
-        mph = speed.value.to("mph").magnitude if speed.value is not None else 0
-        mpg = mph / (maf.value.magnitude * .0805) if maf.value is not None else 0
-        miles_until_empty = mpg * fuel_level.value.to("ratio").magnitude * TANK_CAPACITY if fuel_level.value is not None else 0
+            # applies the saved profile, probing again if the adapter rejects it
+            if (saved := profile.load()) is not None and profile.apply(saved):
+                self.multi_pid = saved.get("multi_pid")
+                return
 
-        # sends updates to the UI
-        try:
-            self.mpg(round(mpg, 2))
-            self.miles_until_empty(round(miles_until_empty, 2))
+            # probes the adapter between benchmarks
+            self.multi_pid = False
+            before = self.benchmark()
+            tuned = profile.probe()
+            self.multi_pid = None
+            after = self.benchmark()
+            tuned.update({"multi_pid": self.multi_pid, "pids_per_second": {"before": before, "after": after}})
+            profile.save(tuned)
+
+        # keeps the default link on failure
         except:
             pass
-        MileManger.add_miles(mph * (dt / 3600))
-        
-    def get_codes(self):
+
+        finally:
+            self.reads = {command.name: 0 for command in self.schedule}
+            self.requests = 0
+            self.schedule_start = monotonic()
+
+    def benchmark(self):
         """
-        runs diagnostics on the OBD-II interface and gets the codes.
+        reads every scheduled pid as fast as possible
 
-        @return: a list of diagnostic trouble codes (DTCs) from the OBD-II interface.
-            Each DTC is represented by a tuple containing the DTC code, and a description (if python-OBD has one)
+        @return the pids read per second
         """
 
-        # fails if bg job manager has not finished connecting to obd
-        try:
-            with self.paused():
-                codes = super(Async, self).query(commands.GET_DTC)
-            return codes.value if codes.value else []
-        
-        # returns no codes on failure
-        except:
-            return []
+        ready = list(self.schedule) or [commands.SPEED]
+        count = 0
+        start = monotonic()
+        while monotonic() - start < OBDAPI.BENCHMARK_TIME:
+            requested, responses = self.read_batch(ready)
+            ready = ready[len(requested):] + requested  # rotates so every pid is read when they do not fit in one request
+            count += len(responses)
+        return round(count / (monotonic() - start), 2)
 
-    def clear_codes(self):
+    def run(self):
         """
-        clears the diagnostic trouble codes (DTCs) from the OBD-II interface.
+        overrides the superclass run method to read each pid at its target rate, reading the most overdue pids first.
+        if connection to car fails or the car stops answering, it reconnects
         """
 
+        due = {command: monotonic() for command in self.schedule}
+        last_answer = monotonic()
+        while self._Async__running:
+            if not self.is_connected():
+                self._Async__running = False
+                self._Async__thread = None
+                break
 
-        # fails if bg job manager has not finished connecting to obd
+            # waits for the next pid to be due
+            now = monotonic()
+            if not due:
+                sleep(OBDAPI.IDLE_SLEEP)
+                continue
+            ready = sorted((command for command in due if due[command] <= now), key=due.get)
+            if not ready:
+                sleep(min(due.values()) - now)
+                continue
+
+            # reads the pids and schedules their next read, skipping missed reads instead of bursting to catch up
+            self.link_free.wait()
+            with self.link_lock:
+                requested, responses = self.read_batch(ready)
+            for command in requested:
+                due[command] = max(due[command] + self.schedule[command], now)
+            for command, response in responses:
+                self._Async__commands[command] = response
+                self.reads[command.name] += 1
+                for callback in self._Async__callbacks.get(command, []):
+                    callback(response)
+            self.update_loop(responses)
+
+            # the adapter stays open when the car is turned off so the reconnector can wait for the ignition
+            if responses:
+                last_answer = now
+            elif now - last_answer > OBDAPI.CAR_OFF_TIMEOUT:
+                self.interface._ELM327__status = OBDStatus.OBD_CONNECTED
+
+        if not self.is_connected():
+            self.job_manager.queue_obd_connection_job(self)
+
+    def read_batch(self, ready):
+        """
+        reads the most overdue pids, several at once when the adapter supports it
+
+        @param ready: the commands that are due ordered from most to least overdue
+
+        @return a tuple of the list of commands that were requested and a list of (command, response) tuples for the pids that answered
+        """
+
+        # reads a single pid when batching is not possible or the most overdue pid can not be batched so it is not starved
+        batch = [command for command in ready if command.command[:2] == b"01" and command.bytes > 0][:OBDAPI.MAX_BATCH]
+        if self.multi_pid is False or len(batch) < 2 or batch[0] is not ready[0]:
+            self.requests += 1
+            response = super(Async, self).query(ready[0], force=True)
+            return [ready[0]], [(ready[0], response)] if not response.is_null() else []
+
+        # sends every pid in one request, ie 010D102F
+        request = b"01" + b"".join(command.command[2:] for command in batch)
+        messages = self.interface.send_and_parse(request)
+        self._OBD__last_command = request  # stops fast mode from repeating the wrong command
+        self.requests += 1
+        responses = self.split_response(batch, messages)
+
+        # falls back to single pids if the adapter did not answer every pid
+        if self.multi_pid is None:
+            self.multi_pid = len(responses) == len(batch)
+        return batch, responses
+
+    @staticmethod
+    def split_response(batch, messages, freeze_frame=False):
+        """
+        splits the response to a multi pid request into a response for each pid.
+        the data of each message is the mode followed by each pid and its data bytes, ie 41 0D 3C 10 01 F4 2F 80,
+        freeze frame responses also have the frame number after each pid, ie 42 0D 00 3C 0C 00 1A F8
+
+        @param batch: the commands that were requested
+        @param messages: the parsed messages from the adapter, one for each ecu that answered
+        @param freeze_frame: if the messages answer a mode 02 freeze frame request instead of a mode 01 request
+
+        @return a list of (command, response) tuples for the pids that were answered
+        """
+
+        mode, skip = (0x42, 1) if freeze_frame else (0x41, 0)
+        by_pid = {command.pid: command for command in batch}
+        parts = {}
+        for message in messages or []:
+            data = message.data
+            i = 1
+            while len(data) and data[0] == mode and i < len(data) and (command := by_pid.get(data[i])):
+                start = i + 1 + skip
+                length = command.bytes - 2
+                if start + length > len(data):
+                    break
+
+                # copies the message with only the data of this pid so python-OBD can decode it as mode 01
+                part = copy(message)
+                part.data = bytearray([0x41, data[i]]) + data[start:start + length]
+                parts.setdefault(command, []).append(part)
+                i = start + length
+
+        responses = [(command, command(parts[command])) for command in batch if command in parts]
+        return [(command, response) for command, response in responses if not response.is_null()]
+
+    @property
+    def rates(self):
+        """
+        @return a dictionary of each pid to its target and achieved reads per second, and the requests sent per second
+        """
+
+        elapsed = max(monotonic() - self.schedule_start, 1e-9)
+        rates = {command.name: {"target": round(1 / period, 2), "achieved": round(self.reads.get(command.name, 0) / elapsed, 2)} for command, period in self.schedule.items()}
+        rates["requests_per_second"] = round(self.requests / elapsed, 2)
+        rates["multi_pid"] = self.multi_pid
+        return rates
+
+    def update_loop(self, responses):
+        """
+        main update loop for the OBD-II interface, called after each request with the pids that were read
+
+        @param responses: a list of (command, response) tuples
+        """
+
+        # records the samples for the trip history
+        values = {}
+        for command, response in responses:
+            if response.value is not None and hasattr(response.value, "magnitude"):
+                value = response.value.to("mph").magnitude if command == commands.SPEED else response.value.magnitude
+                self.trip.record(command.name, response.time, value)
+                values[command.name] = value
+
+        # updates the fuel economy at a fixed rate instead of on every response
+        if time() - self.last_update >= OBDAPI.UPDATE_INTERVAL:
+            self.last_update = time()
+            economy = self.economy.update()
+            values["mpg"] = round(economy["rolling"], 2)
+            values["trip_mpg"] = round(economy["trip"], 2)
+            values["miles_until_empty"] = round(economy["miles_until_empty"], 2)
+            MileManger.add_miles(economy["miles"])
+
+        # publishes the values for the UI to read on its next frame
+        if values:
+            self.snapshot.publish(values)
+
+    def read_diagnostics(self, progress, clear=False):
+        """
+        reads the stored (mode 03), pending (mode 07) and permanent (mode 0A) trouble codes and the freeze frame
+        in one session, pid reads wait between requests until the session is done. must be run in a background job
+
+        @param progress: called from the job thread with a description of each step
+        @param clear: if the codes are cleared (mode 04) before reading them
+
+        @return a dictionary of the stored, pending and permanent codes as lists of (code, description) tuples or None if they could not be read,
+            the freeze frame and the history of codes that are no longer active, or None if the car is not connected
+        """
+
+        if not self.is_connected():
+            return None
+        steps = [("stored", commands.GET_DTC), ("pending", commands.GET_CURRENT_DTC), ("permanent", OBDAPI.PERMANENT_DTC)]
+        total = len(steps) + 1 + clear
+        diagnostics = {}
+
+        # the read loop waits before its next request so it can not take the link back first
+        self.link_free.clear()
         try:
-            with self.paused():
-                super(Async, self).query(commands.CLEAR_DTC)
+            with self.link_lock:
+                if clear:
+                    progress(f"Clearing codes (1/{total})")
+                    super(Async, self).query(commands.CLEAR_DTC, force=True)
 
-        # do nothing on failure
-        except:
-            return
+                # reads the codes
+                for step, (name, command) in enumerate(steps, 1 + clear):
+                    progress(f"Reading {name} codes ({step}/{total})")
+                    codes = super(Async, self).query(command, force=True).value  # None when the read failed or timed out
+                    diagnostics[name] = DTCDescriptions.describe(codes) if codes is not None else None
+
+                progress(f"Reading freeze frame ({total}/{total})")
+                diagnostics["freeze_frame"] = self.read_freeze_frame()
+        finally:
+            self.link_free.set()
+
+        # records the codes in the history
+        self.dtc_history.record(diagnostics, clear)
+        diagnostics["history"] = self.dtc_history.inactive
+        return diagnostics
+
+    def read_freeze_frame(self):
+        """
+        reads the freeze frame stored with the code that turned on the check engine light, must hold the link lock
+
+        @return a dictionary of the code that stored the frame and a list of (description, value) tuples,
+            or None if there is no freeze frame
+        """
+
+        # reads the code that stored frame 0
+        messages = self.interface.send_and_parse(b"020200")
+        self._OBD__last_command = b"020200"  # stops fast mode from repeating the wrong command
+        data = next((message.data for message in messages or [] if len(message.data) >= 5 and message.data[:3] == b"\x42\x02\x00"), None)
+        code = parse_dtc(data[3:5]) if data else None
+        if code is None or code[0] == "P0000":
+            return None
+
+        # reads the frame, several pids at once when the adapter supports it
+        frame = [command for name in OBDAPI.FREEZE_FRAME if self.supports(command := getattr(commands, name))]
+        size = OBDAPI.MAX_FREEZE_BATCH if self.multi_pid else 1
+        values = []
+        for i in range(0, len(frame), size):
+            batch = frame[i:i + size]
+            request = b"02" + b"".join(command.command[2:] + b"00" for command in batch)
+            values += self.split_response(batch, self.interface.send_and_parse(request), freeze_frame=True)
+            self._OBD__last_command = request
+
+        return {
+            "code": DTCDescriptions.describe([code])[0],
+            "values": [(command.desc, f"{round(response.value.magnitude, 1):g} {response.value.units:~P}" if hasattr(response.value, "magnitude") else str(response.value)) for command, response in values]
+        }
 
     def stop(self):
         """
@@ -119,21 +377,16 @@ class OBDAPI(Async):
         except:
             return
 
-    def run(self):
-        """
-        overrides the superclass run method to ensure if connection to car fails, it retries
-        """
-
-        super().run()
-        if not self.is_connected():
-            self.job_manager.queue_obd_connection_job(self, self.root)
-
     def shutdown(self):
         """
         shuts down the OBD-II interface.
         """
 
+        if (logger := getLogger(__name__)).isEnabledFor(DEBUG):
+            logger.debug("OBD rates: %s", self.rates)
         try:
             self.close()  # can fail if not initialized
         finally:
+            self.trip.close()
+            self.economy.save()
             MileManger.save()
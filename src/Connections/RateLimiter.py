@@ -0,0 +1,125 @@
+from threading import Lock
+from time import monotonic, sleep
+
+
+class RateLimiter:
+    """
+    a token bucket shared by every thread sending requests to the same api.
+    tokens refill at a steady rate up to a burst size and each request takes one,
+    so a burst of skipped tracks or pending queries is spread out instead of getting the app throttled
+
+    when the api responds with 429 the bucket is paused for the Retry-After time
+    """
+
+    def __init__(self, rate, burst):
+        """
+        initializes the bucket as full
+
+        @param rate: the number of requests allowed per second
+        @param burst: the maximum number of requests that can be sent at once
+        """
+
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = monotonic()
+        self.paused_until = 0
+        self.lock = Lock()
+
+        # metrics
+        self.waits = 0
+        self.wait_time = 0.0
+        self.rejected = 0
+        self.pauses = 0
+
+    def acquire(self, max_wait, cancel=None):
+        """
+        takes a token, waiting for one to refill if needed
+
+        @param max_wait: the maximum number of seconds to wait
+        @param cancel: an event that is set when the request is no longer needed
+
+        @return if a token was taken, False if it would take longer than max_wait or the request was cancelled
+        """
+
+        if (delay := self.reserve(max_wait)) is None:
+            return False
+
+        # waits for the token in small steps so a cancelled request does not wait
+        end = monotonic() + delay
+        while (remaining := end - monotonic()) > 0:
+            if cancel and cancel.is_set():
+                self.release()
+                return False
+            sleep(min(remaining, .1))
+        return True
+
+    def reserve(self, max_wait):
+        """
+        reserves a token without waiting for it, used by callers that wait on their own such as the asyncio loop
+
+        @param max_wait: the maximum number of seconds the token can take to refill
+
+        @return the number of seconds to wait before the token can be used or None if it would take longer than max_wait
+        """
+
+        with self.lock:
+
+            # refills the bucket, nothing refills while paused
+            now = monotonic()
+            self.tokens = min(self.burst, self.tokens + max(0, now - self.updated) * self.rate)
+            self.updated = max(now, self.updated)
+
+            # reserves a token, the bucket goes negative so waiting threads are served in order
+            delay = max(0, self.updated - now) + max(0, (1 - self.tokens) / self.rate)
+            if delay > max_wait:
+                self.rejected += 1
+                return None
+            self.tokens -= 1
+            if delay:
+                self.waits += 1
+                self.wait_time += delay
+            return delay
+
+    def release(self):
+        """
+        returns a reserved token that was not used
+        """
+
+        with self.lock:
+            self.tokens += 1
+
+    def pause(self, seconds):
+        """
+        stops all requests for a number of seconds, used when the api responds with 429
+
+        @param seconds: the number of seconds to pause for
+        """
+
+        with self.lock:
+            self.paused_until = max(self.paused_until, monotonic() + seconds)
+            self.updated = max(self.updated, self.paused_until)
+            self.tokens = min(self.tokens, 0)  # requests resume one at a time
+            self.pauses += 1
+
+    @property
+    def paused(self):
+        """
+        @return if requests are paused because the api responded with 429
+        """
+
+        return monotonic() < self.paused_until
+
+    @property
+    def metrics(self):
+        """
+        @return a dictionary of the number of requests that waited, the average wait, rejected requests and pauses
+        """
+
+        with self.lock:
+            return {
+                "waits": self.waits,
+                "average_wait_ms": round(self.wait_time / self.waits * 1000, 1) if self.waits else 0,
+                "rejected": self.rejected,
+                "pauses": self.pauses
+            }
@@ -1,3 +1,5 @@
+from Connections.HTTPSession import HTTPSession
+from Connections.AsyncHTTP import AsyncHTTP
 from os import mkdir, remove
 from shutil import rmtree
 from subprocess import check_output, run
@@ -53,15 +55,14 @@ class ReleaseAPI:
         @param update_available: the callback when an update is found
         """
 
-        # lazy load for performance
-        from requests import get
         current_release = check_output(["git", "describe", "--tags", "--abbrev=0"]).decode("utf-8").strip()
 
         # pulls the latest release from GitHub
         try:
-            releases = get(
-                ReleaseAPI.REPO_URL,
-                timeout=5
+            releases = HTTPSession.request(
+                "github",
+                "GET",
+                ReleaseAPI.REPO_URL
             ).json()
 
             # gets the list of releases newer than the current version
@@ -89,15 +90,17 @@ class ReleaseAPI:
         @param patch: the release patch to download
         """
 
-        # installs the patch
-        from requests import get  # lazy import for performance
+        # downloads the assets at the same time when the async backend is enabled
         mkdir(f"../patches/{patch['tag_name']}")
-        for asset in patch["assets"]:
+        if AsyncHTTP.available():
+            contents = AsyncHTTP.run(ReleaseAPI.download_assets(patch["assets"]))
+        else:
+            contents = [HTTPSession.request("github", "GET", asset["browser_download_url"]).content for asset in patch["assets"]]
+
+        # installs the patch
+        for asset, content in zip(patch["assets"], contents):
             with open(f"../patches/{patch['tag_name']}/{asset['name']}", "wb") as f:
-                f.write(get(
-                    asset["browser_download_url"],
-                    timeout=5
-                ).content)
+                f.write(content)
 
         # adds patch to update script
         with open(f"../patches/update.sh", "a") as f:
@@ -107,6 +110,20 @@ class ReleaseAPI:
             f.write("/bin/bash ./update.sh\n")
             f.write("cd ..\n")
         
+    @staticmethod
+    async def download_assets(assets):
+        """
+        downloads the files of a patch from the asyncio thread at the same time
+
+        @param assets: the assets of the release patch
+
+        @return a list of the contents of each asset
+        """
+
+        from asyncio import gather  # lazy loaded for performance
+        responses = await gather(*(AsyncHTTP.request("github", "GET", asset["browser_download_url"]) for asset in assets))
+        return [body for _, _, body in responses]
+
     def update(self):
         """
         updates the software to the latest version
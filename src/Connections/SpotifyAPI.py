@@ -1,14 +1,22 @@
+from Connections.HTTPSession import HTTPSession
+from Connections.AsyncHTTP import AsyncHTTP
+from AppData import ALBUM_ART_RESOLUTION
 from base64 import b64encode
 from os import environ
 
 
 class SpotifyAPI:
     """
-    a class to handles calls to the Spotify API to get album art
+    a class to handles calls to the Spotify API to get album art.
+    all requests share one pooled and rate limited session so lookups reuse open connections
+    and bursts of lookups do not get the app throttled
+
+    when the async backend is enabled request_data_async sends lookups from the asyncio thread instead
     """
 
     TOKEN_URL = "https://accounts.spotify.com/api/token"
     SEARCH_URL = "https://api.spotify.com/v1/search"
+    CHUNK_SIZE = 16_384  # how many bytes of an image are downloaded between cancellation checks
 
     def __init__(self):
         """
@@ -26,17 +34,18 @@ class SpotifyAPI:
         """
 
         # prepares api call
-        from requests import post  # lazy loaded for performance
         credentials = f"{self.client_id}:{self.client_secret}"
         credentials = b64encode(credentials.encode()).decode()
 
         # sends request
         try:
-            response = post(
+            response = HTTPSession.request(
+                "spotify",
+                "POST",
                 SpotifyAPI.TOKEN_URL,
+                endpoint="token",
                 headers={"Authorization": f"Basic {credentials}"},
-                data={"grant_type": "client_credentials"},
-                timeout=5
+                data={"grant_type": "client_credentials"}
             ).json()
 
             # sets token and returns
@@ -44,37 +53,80 @@ class SpotifyAPI:
         except:
             return {"access_token": None, "expires_in": 0}
 
+    @staticmethod
+    def pick_image(images):
+        """
+        picks the smallest image variant that is still at least the album art resolution
+        so no more bytes than needed are downloaded
+
+        @param images: the list of image variants from the spotify api
+
+        @return the image variant to download, the largest one if none are big enough
+        """
+
+        large_enough = [image for image in images if (image.get("width") or 0) >= ALBUM_ART_RESOLUTION]
+        return min(large_enough, key=lambda image: image["width"]) if large_enough else images[0]
+
+    @classmethod
+    def download(cls, url, cancel=None):
+        """
+        downloads an image in chunks so the download can be aborted part way through
+
+        @param url: the url of the image
+        @param cancel: an event that is set when the download is no longer needed
+
+        @return the bytes of the image or None if the download was cancelled
+        """
+
+        with HTTPSession.request("spotify", "GET", url, endpoint="image", cancel=cancel, stream=True) as response:
+            image = bytearray()
+            for chunk in response.iter_content(cls.CHUNK_SIZE):
+                if cancel and cancel.is_set():
+                    return None  # closing a partly read response drops the connection
+                image += chunk
+            return bytes(image)
+
     @classmethod
-    def request_data(cls, title, artist, token):
+    def request_data(cls, title, artist, token, cancel=None):
         """
         attempts to query spotify for the track data
 
         @param title: the title of the track
         @param artist: the artist of the track
         @param token: the api token
+        @param cancel: an event that is set when the data is no longer needed, checked between requests
 
-        @return a list containing the track data: [title, artist, album, art]
+        @return a list containing the track data: [title, artist, album, art] or None on failure or cancellation
         """
 
         # tries various combinations of requests with and without features
-        from requests import get  # lazy loaded for performance
         for i, artist_option in enumerate((artist, artist.split(",")[0])):
             for j, title_option in enumerate((title, title.split(" (feat")[0])):
+                if cancel and cancel.is_set():
+                    return
                 try:
 
                     # queries spotify api
-                    response = get(
+                    response = HTTPSession.request(
+                        "spotify",
+                        "GET",
                         cls.SEARCH_URL,
+                        endpoint="search",
+                        cancel=cancel,
                         headers={"Authorization": f"Bearer {token}"}, 
-                        params={"q": f'track:"{title_option}" artist:"{artist_option}"', "type": "track", "limit": 1},
-                        timeout=5
-                    ).json()
+                        params={"q": f'track:"{title_option}" artist:"{artist_option}"', "type": "track", "limit": 1}
+                    )
+
+                    # throttled requests are retried later instead of trying the other combinations
+                    if response.status_code == 429:
+                        return
+                    response = response.json()
 
                     # pulls the album name and album art from the response
                     track = response.get("tracks", {}).get("items", [])[0]
                     album_name = track["album"]["name"]
-                    album_art = get(track["album"]["images"][0]["url"]).content
-                    return [title, artist, album_name, album_art]
+                    album_art = cls.download(cls.pick_image(track["album"]["images"])["url"], cancel)
+                    return [title, artist, album_name, album_art] if album_art is not None else None
                 
                 # handles art doesn't exist
                 except IndexError:
@@ -84,3 +136,68 @@ class SpotifyAPI:
                 # handles query failures
                 except:
                     return
+
+    @classmethod
+    async def download_async(cls, url, cancel=None):
+        """
+        the same as download but sent from the asyncio thread
+
+        @param url: the url of the image
+        @param cancel: an event that is set when the download is no longer needed
+
+        @return the bytes of the image or None if the download was cancelled
+        """
+
+        _, _, image = await AsyncHTTP.request("spotify", "GET", url, endpoint="image", cancel=cancel)
+        return image
+
+    @classmethod
+    async def request_data_async(cls, title, artist, token, cancel=None):
+        """
+        the same as request_data but sent from the asyncio thread so many lookups can wait at once without a thread each
+
+        @param title: the title of the track
+        @param artist: the artist of the track
+        @param token: the api token
+        @param cancel: an event that is set when the data is no longer needed, checked between requests
+
+        @return a list containing the track data: [title, artist, album, art] or None on failure or cancellation
+        """
+
+        from json import loads  # lazy loaded for performance
+
+        # tries various combinations of requests with and without features
+        for artist_option in (artist, artist.split(",")[0]):
+            for title_option in (title, title.split(" (feat")[0]):
+                if cancel and cancel.is_set():
+                    return
+                try:
+
+                    # queries spotify api
+                    status, _, body = await AsyncHTTP.request(
+                        "spotify",
+                        "GET",
+                        cls.SEARCH_URL,
+                        endpoint="search",
+                        cancel=cancel,
+                        headers={"Authorization": f"Bearer {token}"},
+                        params={"q": f'track:"{title_option}" artist:"{artist_option}"', "type": "track", "limit": "1"}
+                    )
+
+                    # throttled requests are retried later instead of trying the other combinations
+                    if status == 429 or body is None:
+                        return
+
+                    # pulls the album name and album art from the response
+                    track = loads(body).get("tracks", {}).get("items", [])[0]
+                    album_name = track["album"]["name"]
+                    album_art = await cls.download_async(cls.pick_image(track["album"]["images"])["url"], cancel)
+                    return [title, artist, album_name, album_art] if album_art is not None else None
+
+                # handles art doesn't exist
+                except IndexError:
+                    continue
+
+                # handles query failures
+                except:
+                    return
@@ -1,7 +1,14 @@
-from AppData import MAX_CACHED_ALBUMS
+from AppData import MAX_CACHED_ALBUMS, ALBUM_ART_MEMORY, ALBUM_ART_FORMAT
+from DataManagers.ImageMemoryCache import ImageMemoryCache
+from DataManagers.CacheIndex import CacheIndex
+from DataManagers.PriorityExecutor import PriorityExecutor
+from DataManagers.TrackKeys import TrackKeys
 from diskcache import Cache
-from collections import OrderedDict
+from struct import Struct
+from io import BytesIO
+from json import dumps, loads
 from threading import Lock
+from PIL.Image import open as open_img, Image
 
 
 class AlbumArtCache(Cache):
@@ -9,8 +16,25 @@ class AlbumArtCache(Cache):
     a class to represent a cache of api queries for album art
     with efficient storage by only storing 1 image per album
     and each song within the album references the same image
+
+    recently shown albums are additionally kept decoded in memory
+    so they can be displayed without reading from the disk
+
+    when the exact song and album keys miss, fuzzy keys that ignore casing, punctuation,
+    featured artists and remaster/edition suffixes are checked before querying the api
+
+    album art is stored as compressed image bytes with a small header:
+        magic (4 bytes) | format (1 byte) | resolution (2 bytes) | encoded image
     """
 
+    # storage format fields
+    HEADER = Struct("<4sBH")
+    MAGIC = b"4RAA"
+    FORMATS = {
+        "PNG": {"id": 0, "options": {"compress_level": 6}},
+        "WEBP": {"id": 1, "options": {"quality": 90, "method": 4}},
+    }
+
     def __init__(self, default):
         """
         initializes the cache variables
@@ -20,8 +44,20 @@ class AlbumArtCache(Cache):
 
         super().__init__("AppData/image_cache")
         self.default_art = default
-        self.LRU_lock = Lock()
-        self.pending_lock = Lock()
+        self.memory = ImageMemoryCache(ALBUM_ART_MEMORY * 1_000_000)
+        self.index = CacheIndex("AppData/image_cache/index.db")
+        self.create_tag_index()  # albums are evicted by tag
+        self.lookups = {"memory": 0, "exact": 0, "fuzzy": 0, "miss": 0}
+        self.lookups_lock = Lock()
+
+        # converts the recency bookkeeping stored by older versions
+        if (LRU_dict := self.get("LRU")) is not None:
+            self.index.import_order(LRU_dict)
+            self.delete("LRU")
+        if (pending := self.get("pending")) is not None:
+            for title, artist in pending:
+                self.index.add_pending(title, artist)
+            self.delete("pending")
     
     def touch_album(self, album, song=None):
         """
@@ -31,25 +67,21 @@ class AlbumArtCache(Cache):
         @param song: the song to link to the album if it is not already
         """
 
-        with self.LRU_lock:
-            LRU_dict = self.get("LRU", OrderedDict())
-
-            # links song to album if needed
-            if song and (album in LRU_dict):
-                self.set(song, album, tag=album)
+        # links song to album if needed
+        if song:
+            if album not in self.index:
+                return
+            self.set(song, album, tag=album)
 
-            # touches the album
-            if (not song) or (song and (album in LRU_dict)):
-                LRU_dict[album] = None
-                LRU_dict.move_to_end(album)
-                self.set("LRU", LRU_dict)
+        # touches the album
+        self.index.touch(album)
     
     def read_album(self, album, pool, song=None):
         """
         marks an album as most recently used (MRU) and reads the data it stores
 
         @param album: the album to read the data of
-        @param pool: a thread pool owned by the cache manager to handle spawning new jobs if needed
+        @param pool: a priority thread pool owned by the cache manager to handle spawning new jobs if needed
         @param song: the song to link to the album if it is not already
 
         @return the album art for the album or the default album art if it does not have any
@@ -57,7 +89,9 @@ class AlbumArtCache(Cache):
         
         if not (art := self.get(album)):
             return None if song or album != f"albums:{None}" else self.default_art
-        pool.submit(self.touch_album, album, song)
+        art = self.decode(art)
+        pool.submit_priority(PriorityExecutor.MAINTENANCE, self.touch_album, album, song)
+        self.memory.put(album, art, song)
         return art
         
     def fetch(self, title, artist, album, pool):
@@ -67,19 +101,105 @@ class AlbumArtCache(Cache):
         @param title: the title of the song
         @param artist: the artist of the song
         @param album: the album of the track
-        @param pool: a thread pool owned by the cache manager to handle spawning new jobs if needed
+        @param pool: a priority thread pool owned by the cache manager to handle spawning new jobs if needed
 
         @return the cached album art or None if not stored
         """
 
+        # checks memory before reading from the disk, the disk recency is still touched so shown albums are not evicted
+        song_key, album_key = f"songs:{title}\n{artist}", self.album_key(title, artist, album)
+        if found := self.memory.get(album_key, song_key):
+            stored, image = found
+            pool.submit_priority(PriorityExecutor.MAINTENANCE, self.touch_album, stored)
+            return self.count_lookup("memory", image)
+
         # checks cache with album and artist
-        song_key, album_key = f"songs:{title}\n{artist}", f"albums:{album}\n{artist.split(',')[0]}"
         if image := self.read_album(album_key, pool, song_key):
-            return image
+            return self.count_lookup("exact", image)
+
+        # checks cache with song and artist, songs with default album art are not kept in memory so they are retried
+        if (stored := self.get(song_key)) and (image := self.read_album(stored, pool)):
+            self.memory.put(stored, image, song_key) if stored != f"albums:{None}" else None
+            return self.count_lookup("exact", image)
+
+        # checks the fuzzy keys, the song is only linked in memory since a fuzzy match can be wrong
+        if (stored := self.index.alias(self.fuzzy_keys(title, artist, album))) and (image := self.read_album(stored, pool)):
+            self.memory.put(stored, image, song_key)
+            return self.count_lookup("fuzzy", image)
+        self.count_lookup("miss")
+
+    @staticmethod
+    def album_key(title, artist, album=None):
+        """
+        @param title: the title of the song
+        @param artist: the artist of the song
+        @param album: the album of the song
+
+        @return the key the album art is stored under, art of songs without an album (ie untagged local files)
+            is stored per song so songs by the same artist do not share it
+        """
+
+        return f"albums:{album}\n{artist.split(',')[0]}" if album else f"albums:{None}\n{artist.split(',')[0]}\n{title}"
+
+    @staticmethod
+    def fuzzy_keys(title, artist, album=None):
+        """
+        @param title: the title of the song
+        @param artist: the artist of the song
+        @param album: the album of the song
+
+        @return the fuzzy keys to look up, only the album key when the album is known
+            so songs with the same title on another album (ie "Intro") are not matched
+        """
+
+        return [TrackKeys.fuzzy_album(album, artist)] if album else [TrackKeys.fuzzy_song(title, artist)]
+
+    @staticmethod
+    def alias_keys(title, artist, album=None):
+        """
+        @param title: the title of the song
+        @param artist: the artist of the song
+        @param album: the album of the song
+
+        @return the fuzzy keys of the song and album to link to a stored album
+        """
+
+        return [TrackKeys.fuzzy_song(title, artist)] + ([TrackKeys.fuzzy_album(album, artist)] if album else [])
+
+    def count_lookup(self, result, image=None):
+        """
+        records the result of a lookup
+
+        @param result: the name of the result, one of memory, exact, fuzzy or miss
+        @param image: the image found by the lookup
+
+        @return the image so the result can be returned directly
+        """
+
+        with self.lookups_lock:
+            self.lookups[result] += 1
+        return image
+
+    @property
+    def report(self):
+        """
+        @return a dictionary of the number of lookups of each result and the overall hit rate
+        """
+
+        with self.lookups_lock:
+            total = sum(self.lookups.values())
+            return {**self.lookups, "hit_rate": round((total - self.lookups["miss"]) / total, 3) if total else 0}
+
+    def warm_memory(self, limit):
+        """
+        loads the most recently used albums into memory so recently played tracks display instantly
+
+        @param limit: the maximum number of albums to load
+        """
 
-        # checks cache with song and artist
-        if (album := self.get(song_key)) and (image := self.read_album(album, pool)):
-            return image
+        for album in reversed(self.index.recent(limit)):
+            if art := self.get(album):
+                self.memory.put(album, self.decode(art))
 
     def store(self, title, artist, album=None, art=None):
         """
@@ -92,48 +212,166 @@ class AlbumArtCache(Cache):
         """
 
         # associates song with album
-        key, value = f"songs:{title}\n{artist}", f"albums:{album}\n{artist.split(',')[0]}"
+        key, value = f"songs:{title}\n{artist}", self.album_key(title, artist, album)
         self.set(key, value, tag=value)
 
-        # sets album art
-        if art and (not value in self):
-            self.set(value, art, tag=value)
+        # sets album art, relinking the song in memory in case it was shown before the art was found
+        if art:
+            if value not in self:
+                self.set(value, self.encode(art), tag=value)
+            self.memory.put(value, art, key)
+
+            # links the fuzzy keys, songs with default album art are never linked so they are retried
+            self.index.add_aliases(self.alias_keys(title, artist, album), value)
+            self.touch_album(value)
         
         # handles when song has default album art
-        elif not art:
+        else:
             self.set(key, f"albums:{None}", tag="default")
-        self.touch_album(value)
+            self.memory.unlink(key)
 
         # removes from pending queries
-        with self.pending_lock:
-            pending = self.get("pending", OrderedDict())
-            pending.pop((title, artist), None)
-            self.set(f"pending", pending)
-
+        self.index.remove_pending(title, artist)
         self.clean()
     
-    @property
-    def pending(self):
+    @classmethod
+    def encode(cls, image):
+        """
+        compresses an image to the configured storage format
+
+        @param image: the image to compress
+
+        @return the header followed by the encoded image bytes
+        """
+
+        image_format = cls.FORMATS[ALBUM_ART_FORMAT]
+        buffer = BytesIO()
+        image.save(buffer, format=ALBUM_ART_FORMAT, **image_format["options"])
+        return cls.HEADER.pack(cls.MAGIC, image_format["id"], image.width) + buffer.getvalue()
+
+    @classmethod
+    def decode(cls, value):
+        """
+        decodes album art read from the cache
+
+        @param value: the stored value, either encoded bytes or an image stored by older versions
+
+        @return the decoded image
+        """
+
+        # handles images stored by older versions
+        if not isinstance(value, bytes):
+            return value
+
+        image = open_img(BytesIO(memoryview(value)[cls.HEADER.size:]))
+        image.load()
+        return image
+
+    def migrate(self):
+        """
+        converts all album art stored as raw images by older versions to the compressed storage format
+        and links the fuzzy keys of songs stored before fuzzy keys existed
+
+        @return the number of albums converted
+        """
+
+        converted = 0
+        for key in self.iterkeys():
+            if not isinstance(key, str):
+                continue
+
+            # converts the album art
+            if key.startswith("albums:") and isinstance(art := self.get(key), Image):
+                self.set(key, self.encode(art), tag=key)
+                converted += 1
+
+            # links the fuzzy keys of songs with album art
+            elif key.startswith("songs:") and (album := self.get(key)):
+                self.link_aliases(key, album)
+        return converted
+
+    def link_aliases(self, song, album):
+        """
+        links the fuzzy keys of a stored song to its album, songs with default album art are not linked
+
+        @param song: the key of the song
+        @param album: the key of the album the song is stored with
         """
-        @return the set of all the queries that are pending
+
+        if album != f"albums:{None}":
+            title, artist = song[len("songs:"):].split("\n", 1)
+            album_name = album[len("albums:"):].split("\n", 1)[0]
+            self.index.add_aliases(self.alias_keys(title, artist, album_name if album_name != "None" else None), album)
+
+    def export_bundle(self, path):
         """
+        writes the cached songs, album art and recency to a single archive so the cache can be restored after reflashing.
+        the archive contains:
+            -> index.json: the song to album links and the albums ordered from least to most recently used
+            -> albums/<n>: the stored bytes of each album, already compressed so they are not compressed again
+
+        @param path: the path of the archive to write
+
+        @return a tuple of the number of songs and albums exported
+        """
+
+        from zipfile import ZipFile, ZIP_STORED, ZIP_DEFLATED  # lazy loaded for performance
+
+        songs, albums = {}, {}
+        with ZipFile(path, "w") as bundle:
+            for key in self.iterkeys():
+                if not isinstance(key, str):
+                    continue
+
+                # writes the album art, converting images stored by older versions
+                if key.startswith("albums:") and (art := self.get(key)) is not None:
+                    albums[key] = name = f"albums/{len(albums)}"
+                    bundle.writestr(name, art if isinstance(art, bytes) else self.encode(art), ZIP_STORED)
 
-        with self.pending_lock:
-            return self.get("pending", OrderedDict())
+                # records the song links
+                elif key.startswith("songs:") and (album := self.get(key)):
+                    songs[key] = album
 
-    @pending.setter
-    def pending(self, value):
+            # writes the links and recency of the albums that were written
+            index = {"version": 1, "songs": songs, "albums": albums, "order": [album for album in self.index.order() if album in albums]}
+            bundle.writestr("index.json", dumps(index), ZIP_DEFLATED)
+        return len(songs), len(albums)
+
+    def import_bundle(self, path):
         """
-        adds to the list of pending queries
+        restores the songs, album art and recency from an archive written by export_bundle.
+        albums that are already cached are kept, imported albums become the most recently used
+
+        @param path: the path of the archive to read
 
-        @param value: a pending query
+        @return a tuple of the number of songs and albums imported
         """
 
-        with self.pending_lock:
-            pending = self.get("pending", OrderedDict())
-            pending[value] = None
-            pending.move_to_end(value)
-            self.set(f"pending", pending)
+        from zipfile import ZipFile  # lazy loaded for performance
+
+        with ZipFile(path) as bundle:
+            index = loads(bundle.read("index.json"))
+
+            # restores the album art
+            imported = set()
+            for album, name in index["albums"].items():
+                if album not in self:
+                    self.set(album, bundle.read(name), tag=album)
+                    imported.add(album)
+
+            # restores the song links of cached albums
+            songs = 0
+            for song, album in index["songs"].items():
+                if album == f"albums:{None}" or album in self:
+                    self.set(song, album, tag="default" if album == f"albums:{None}" else album)
+                    self.link_aliases(song, album)
+                    songs += 1
+
+        # restores the recency then removes the least recently used albums if the bundle was too large
+        ordered = set(index["order"])
+        self.index.import_order([album for album in imported if album not in ordered] + [album for album in index["order"] if album in imported])
+        self.clean()
+        return songs, len(imported)
 
     @property
     def token(self):
@@ -158,13 +396,26 @@ class AlbumArtCache(Cache):
         frees up some of the cache by removing elements in order of least recently accessed
         """
 
-        # gets the LRU
-        with self.LRU_lock:
-            LRU_dict = self.get("LRU", OrderedDict())
+        for album in self.index.evict(MAX_CACHED_ALBUMS, self.evict_albums):
+            self.memory.pop(album)
+
+    def evict_albums(self, albums):
+        """
+        removes albums and every song linked to them from the cache
+
+        @param albums: the keys of the albums to remove
+        """
+
+        with self.transact():  # ensures atomicity
+            self.evict("default")
+            for album in albums:
+                self.evict(album)
+
+    def shutdown(self):
+        """
+        closes the index and the cache, close is not overridden since diskcache calls it
+        to reset the connection of each new thread
+        """
 
-            # removes the least recently accessed album
-            while len(LRU_dict) > MAX_CACHED_ALBUMS:
-                with self.transact():  # ensures atomicity
-                    self.evict("default")
-                    self.evict(LRU_dict.popitem(last=False)[0])
-                    self.set("LRU", LRU_dict)
+        self.index.close()
+        self.close()
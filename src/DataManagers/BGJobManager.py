@@ -1,106 +1,92 @@
-from concurrent.futures import ThreadPoolExecutor
+from DataManagers.PriorityExecutor import PriorityExecutor
 from DataManagers.AlbumArtCache import AlbumArtCache
 from Connections.SpotifyAPI import SpotifyAPI
-from io import BytesIO
-from PIL.Image import open as open_img, new as new_img
-from AppData import ALBUM_ART_RESOLUTION
-from PIL.ImageDraw import Draw
-from threading import Lock
-
-
-class BGJobManager(ThreadPoolExecutor):
+from Connections.HTTPSession import HTTPSession
+from Connections.AsyncHTTP import AsyncHTTP
+from DataManagers.ImagePipeline import ImagePipeline
+from DataManagers.LibraryIndex import LibraryIndex
+from DataManagers.TokenRefresher import TokenRefresher
+from DataManagers.OBDReconnector import OBDReconnector
+from AppData import IMAGE_PROCESSES, MUSIC_LIBRARY
+from threading import Lock, Event
+from logging import getLogger, DEBUG
+from concurrent.futures import Future, InvalidStateError
+
+
+class BGJobManager(PriorityExecutor):
     """
-    a class to handle jobs that will run in the background
+    a class to handle jobs that will run in the background.
+    jobs are run in order of priority so the album art on screen is never
+    stuck behind obd, cache maintenance or prefetch jobs
     """
 
-    # initializes global fields
-    image_mask = new_img("L", (ALBUM_ART_RESOLUTION, ALBUM_ART_RESOLUTION), 0)
-    Draw(image_mask).rounded_rectangle([0, 0, ALBUM_ART_RESOLUTION, ALBUM_ART_RESOLUTION], radius=12, fill=255)
+    # maximum number of concurrently running jobs per priority class, interactive jobs are not limited
+    LIMITS = {
+        PriorityExecutor.OBD: 1,
+        PriorityExecutor.MAINTENANCE: 2,
+        PriorityExecutor.PREFETCH: 2,
+    }
+
+    # pending query settings
+    PENDING_BATCH_SIZE = 10  # how many pending queries the drainer takes at a time
+    PENDING_BACKOFF = (30, 3600)  # seconds to wait after the first failed attempt, and the maximum wait between attempts
 
-    def __init__(self):
+    # prefetch settings
+    WARM_RECENT_ALBUMS = 20  # how many of the most recently used albums are loaded into memory on startup
+
+    def __init__(self, startup_jobs=True):
         """
         initializes the request manager and its fields
+
+        @param startup_jobs: whether to warm the memory cache, scan the music library and retry the pending queries,
+            False for command line tools that only look up album art
         """
 
-        super().__init__()
+        super().__init__(limits=BGJobManager.LIMITS)
+        self.image_pipeline = ImagePipeline(IMAGE_PROCESSES)
         with open("AppData/default_album_art.png", "rb") as f:
             self.default_art = self.format_bytes(f.read())
 
         self.api = SpotifyAPI()
         self.cache = AlbumArtCache(self.default_art)
-        self.token_lock = Lock()
+        self.library = LibraryIndex(MUSIC_LIBRARY, "AppData/image_cache/library.db")
+        self.tokens = TokenRefresher(self.api.request_token, self.cache)
         self.obd_lock = Lock()
+        self.obd_reconnector = OBDReconnector(self.obd_lock)
+        self.pending_lock = Lock()
+        self.art_future = None
+        self.art_cancel = Event()
         self.is_shutdown = False
+        if startup_jobs:
+            self.submit_priority(PriorityExecutor.PREFETCH, self.cache.warm_memory, BGJobManager.WARM_RECENT_ALBUMS)
+            self.submit_priority(PriorityExecutor.PREFETCH, self.library.scan, lambda: self.is_shutdown).add_done_callback(lambda f: self.attempt_query_pending())
 
-    def queue_obd_connection_job(self, obd, root):
+    def queue_obd_connection_job(self, obd):
         """
-        queues a job to connect to the obd scanner
+        starts reconnecting to the obd scanner in the background
 
         @param obd the obd api instance to connect to the scanner
-        @param root the UI element to schedule another connection attempt after a bit of time
         """
 
         if not self.is_shutdown:
-            future = self.submit(lambda: self.obd_connection_job(obd))
-            future.add_done_callback(lambda f: self.check_obd_connection(obd, root))
+            self.obd_reconnector.reconnect(obd)
 
-    def obd_connection_job(self, obd):
+    def queue_obd_job(self, fn, *args):
         """
-        attempts to connect to the obd scanner
-
-        @param obd the obd api instance to connect to the scanner
-        """
-
-        # lazy loaded for performance
-        from obd import Async, commands
-
-        with self.obd_lock:
-            try:
-                if not obd.is_connected():
-                    Async.__init__(obd)
-                    obd.watch(commands.MAF)
-                    obd.watch(commands.FUEL_LEVEL)
-                    obd.watch(commands.SPEED, callback=lambda r: obd.update_loop())
-                    obd.start()
+        queues a job that talks to the car, such as reading diagnostic codes
 
-            # is_connected can fail
-            except:
-                    Async.__init__(obd)
-                    obd.watch(commands.MAF)
-                    obd.watch(commands.FUEL_LEVEL)
-                    obd.watch(commands.SPEED, callback=lambda r: obd.update_loop())
-                    obd.start()
+        @param fn: the function to run
+        @param args: the arguments for the function
 
-    def check_obd_connection(self, obd, root):
-        """
-        checks if obd is connected, if not retry later
-
-        @param obd the obd connection to check
-        @param root, the root element to queue the next job with
+        @return a future object to access the results of the job when completed
         """
 
-        # prevents race condition when shutting down
-        with self.obd_lock:
-            if self.is_shutdown:
-                return
-
-            # retries connection on fail
-            try:
-                if not obd.is_connected():
-                    root.after(1000, lambda: self.queue_obd_connection_job(obd, root))
-            except:
-
-                # waits until mainloop has started to try connection again
-                while True:
-                    try:
-                        root.after(1000, lambda: self.queue_obd_connection_job(obd, root))
-                        return
-                    except:
-                        pass
+        return self.submit_priority(PriorityExecutor.OBD, fn, *args)
 
     def queue_album_art_job(self, title, artist, album):
         """
-        queues an album art job to be completed
+        queues an album art job to be completed and cancels the previous album art job
+        since only the art for the latest track will be displayed
 
         @param title: the title of the track
         @param artist: the artist of the track
@@ -110,22 +96,88 @@ class BGJobManager(ThreadPoolExecutor):
         """
 
         if not self.is_shutdown:
-            future = self.submit(lambda: self.album_art_job(title, artist, album))
+
+            # cancels the superseded job, if it is already running it stops at the next network request
+            self.art_cancel.set()
+            self.art_future.cancel() if self.art_future else None
+            self.art_cancel = cancel = Event()
+
+            # queues the new job, the returned future is resolved once the api query is done if the job sends one
+            job = self.submit_priority(PriorityExecutor.INTERACTIVE, self.album_art_job, title, artist, album, cancel)
+            future = Future()
+            self.chain(job, future)
             future.add_done_callback(lambda f: self.attempt_query_pending())
+            self.art_future = job
             return future
 
-    def album_art_job(self, title, artist, album=None):
+    def chain(self, source, target):
+        """
+        resolves a future with the result of a job once the job is done.
+        jobs that send their api query from the asyncio thread return a future of their result,
+        which is chained in turn so no job thread waits on the response
+
+        @param source: the future of the job
+        @param target: the future to resolve
+        """
+
+        def done(future):
+            try:
+                if future.cancelled():
+                    target.cancel()
+                elif (e := future.exception()) is not None:
+                    target.set_exception(e)
+                elif isinstance(result := future.result(), Future):
+                    self.chain(result, target)
+                else:
+                    target.set_result(result)
+
+            # the target was cancelled by a newer job
+            except InvalidStateError:
+                pass
+
+        source.add_done_callback(done)
+
+    def queue_prefetch_job(self, upcoming, count):
+        """
+        queues a job to load the album art of upcoming tracks into the cache ahead of time
+
+        @param upcoming: a function to get the upcoming tracks
+            takes 1 parameter, the maximum number of tracks, and returns a list of (title, artist, album) tuples
+        @param count: the number of upcoming tracks to prefetch
+        """
+
+        if count and not self.is_shutdown:
+            self.submit_priority(PriorityExecutor.PREFETCH, self.prefetch_job, upcoming, count)
+
+    def prefetch_job(self, upcoming, count):
+        """
+        loads the album art of upcoming tracks one at a time so that skipping tracks is instant
+
+        @param upcoming: a function to get the upcoming tracks
+        @param count: the number of upcoming tracks to prefetch
+        """
+
+        for title, artist, album in upcoming(count):
+            if self.is_shutdown:
+                return
+            self.album_art_job(title, artist, album, priority=PriorityExecutor.PREFETCH)
+
+    def album_art_job(self, title, artist, album=None, cancel=None, priority=PriorityExecutor.INTERACTIVE):
         """
         attempts to retrieve the data in the following order:
             -> checks cache
+            -> checks local music library
             -> attempts api call
             -> default image
 
         @param title: the title of the track
         @param artist: the artist of the track
         @param album: the album of the track
+        @param cancel: an event that is set when the job has been superseded by a newer job
+        @param priority: the priority of the job that handles the api response when it is sent from the asyncio thread
 
-        @return image representing the album art
+        @return image representing the album art or None if the job was cancelled,
+            or a future of the image if the api query was sent from the asyncio thread
         """
 
         # handles when no song is playing
@@ -142,22 +194,86 @@ class BGJobManager(ThreadPoolExecutor):
         if image := self.cache.fetch(title, artist, album, self):
             return image
 
-        # attempts api query
-        if data := self.api.request_data(title, artist, self.get_token()):
+        # checks local music library
+        if data := self.library_lookup(title, artist, album):
+            self.submit_priority(PriorityExecutor.MAINTENANCE, self.cache.store, *data)
+            return data[3]
+
+        # attempts api query, from the asyncio thread when enabled so no job thread waits on the response
+        if AsyncHTTP.available():
+            request = AsyncHTTP.submit(self.api.request_data_async(title, artist, self.get_token(), cancel))
+            image = Future()
+            request.add_done_callback(lambda f: self.response_job(f, image, title, artist, cancel, priority))
+            return image
+        return self.handle_response(self.api.request_data(title, artist, self.get_token(), cancel), title, artist, cancel)
+
+    def response_job(self, request, image, title, artist, cancel, priority):
+        """
+        queues a job to handle the response of an api query sent from the asyncio thread, called when the query is done
+
+        @param request: the future of the api query
+        @param image: the future to resolve with the album art
+        @param title: the title of the track
+        @param artist: the artist of the track
+        @param cancel: an event that is set when the job has been superseded by a newer job
+        @param priority: the priority of the job
+        """
+
+        if self.is_shutdown:
+            image.cancel()
+            return
+        data = request.result() if not request.cancelled() and request.exception() is None else None
+        self.chain(self.submit_priority(priority, self.handle_response, data, title, artist, cancel), image)
+
+    def handle_response(self, data, title, artist, cancel=None):
+        """
+        formats and stores the result of an api query
+
+        @param data: the track data from the api query or None if it failed
+        @param title: the title of the track
+        @param artist: the artist of the track
+        @param cancel: an event that is set when the job has been superseded by a newer job
+
+        @return image representing the album art or None if the job was cancelled
+        """
+
+        if data:
             image = self.default_art
             if len(data) == 4:
                 data[3] = image = self.format_bytes(data[3])
 
             # queues cache store and returns
-            self.submit(self.cache.store, *data)
+            self.submit_priority(PriorityExecutor.MAINTENANCE, self.cache.store, *data)
             return image
         
+        # a cancelled job is not retried since the track was skipped
+        if cancel and cancel.is_set():
+            return None
+
         # adds to pending queries and returns default image
-        self.cache.pending = (title, artist)
+        self.cache.index.add_pending(title, artist, BGJobManager.PENDING_BACKOFF[0])
         return self.default_art
     
-    @classmethod
-    def format_bytes(cls, image_bytes):
+    def library_lookup(self, title, artist, album=None):
+        """
+        attempts to find the album art of a track in the local music library
+
+        @param title: the title of the track
+        @param artist: the artist of the track
+        @param album: the album of the track
+
+        @return a list containing the track data: [title, artist, album, art] or None if it is not found
+        """
+
+        try:
+            if local := self.library.lookup(title, artist, album):
+                return [title, artist, local[0] or album, self.format_bytes(local[1])]
+
+        # art that can not be decoded is ignored
+        except:
+            return None
+
+    def format_bytes(self, image_bytes):
         """
         compresses an images bytes to the correct resolution and adds rounded corners
 
@@ -166,52 +282,108 @@ class BGJobManager(ThreadPoolExecutor):
         @return the formatted bytes
         """
 
-        image = open_img(BytesIO(image_bytes)).resize((ALBUM_ART_RESOLUTION, ALBUM_ART_RESOLUTION)).convert("RGBA")
-        image.putalpha(cls.image_mask)
-        return image
+        return self.image_pipeline.format(image_bytes)
     
     def get_token(self):
         """
-        attempts to get the token in the following order
-            -> checks cache
-            -> attempts api call
+        gets the api token, which is renewed in the background before it expires
 
-        @return the token if it is found
+        @return the token or None if no valid token could be requested
         """
 
-        # cache hit
-        with self.token_lock:
-            if token := self.cache.token:
-                return token
-            
-            # token expired
-            token = self.api.request_token()
-            self.cache.token = token
-            return token["access_token"]
+        return self.tokens.get()
     
     def attempt_query_pending(self):
         """
-        attempts to make api queries for the songs that failed the request_image method
+        starts the pending query drainer if it is not already running and spotify is not throttling requests
+        """
+
+        if self.is_shutdown or HTTPSession.limited("spotify") or not self.pending_lock.acquire(blocking=False):
+            return
+        future = self.submit_priority(PriorityExecutor.PREFETCH, self.pending_job)
+        future.add_done_callback(lambda f: self.pending_lock.release())
+
+    def pending_job(self):
+        """
+        attempts api queries for the songs that failed the album_art_job method in batches.
+        stops at the first failure since the remaining queries would most likely fail as well
+        """
+
+        while (not self.is_shutdown) and (batch := self.cache.index.take_pending(BGJobManager.PENDING_BATCH_SIZE)):
+            done = 0
+            try:
+                for title, artist in batch:
+                    if self.is_shutdown:
+                        return
+                    succeeded = self.query_pending(title, artist)
+                    done += 1
+                    if not succeeded:
+                        return
+
+            # releases the rows that were not queried, even if a query raised
+            finally:
+                self.cache.index.release_pending(batch[done:])
+
+    def query_pending(self, title, artist):
+        """
+        checks the local music library then attempts an api query for a pending song and stores the result
+
+        @param title: the title of the track
+        @param artist: the artist of the track
+
+        @return if the query succeeded
         """
 
-        # iterates over every song
-        for query in self.cache.pending:
-            self.submit(self.album_art_job, *query)
+        # backs off on failure
+        if not (data := self.library_lookup(title, artist) or self.api.request_data(title, artist, self.get_token())):
+            self.cache.index.retry_pending(title, artist, *BGJobManager.PENDING_BACKOFF)
+            return False
+
+        # stores the result, which also removes it from the pending queries
+        if len(data) == 4 and isinstance(data[3], bytes):
+            data[3] = self.format_bytes(data[3])
+        self.cache.store(*data)
+        return True
+
+    def log_metrics(self):
+        """
+        writes a summary of the background job metrics to the debug log, does nothing when debug logging is off
+        """
 
-    def shutdown(self, root, wait = True, *, cancel_futures = False):
+        if not (logger := getLogger(__name__)).isEnabledFor(DEBUG):
+            return
+        logger.debug("background job metrics: %s", {
+            "album_art_memory": self.cache.memory.stats,
+            "jobs": self.metrics,
+            "album_art_formatting": self.image_pipeline.stats,
+            "album_art_lookups": self.cache.report,
+            "api_token": self.tokens.metrics,
+            "network": HTTPSession.metrics(),
+            "obd_connection": self.obd_reconnector.metrics,
+        })
+
+    def shutdown(self, root=None, wait = True, *, cancel_futures = False):
         """
         overrides the shutdown method to close the diskcache
 
-        @param root: the UI to update while waiting for jobs to finish to prevent race conditions
+        @param root: the UI to update while waiting for jobs to finish to prevent race conditions, None without a UI
         """
 
         # ensured obd job can finish UI updates
-        while not self.obd_lock.acquire(blocking=False):
-            root.update()
+        if root is None:
+            self.obd_lock.acquire()
+        else:
+            while not self.obd_lock.acquire(blocking=False):
+                root.update()
 
         # shuts down thread pool and cache
         self.is_shutdown = True
+        self.obd_reconnector.stop()
         self.obd_lock.release()
+        self.tokens.stop()
         super().shutdown(cancel_futures=True)
-        self.cache.close()
+        self.log_metrics()
+        self.image_pipeline.shutdown()
+        self.library.close()
+        self.cache.shutdown()
         
\ No newline at end of file
@@ -0,0 +1,244 @@
+from sqlite3 import connect
+from threading import Lock
+from time import time_ns, time
+
+
+class CacheIndex:
+    """
+    a class to represent the bookkeeping tables of the album art cache.
+    stored in its own sqlite database next to the cache so each update is a
+    single indexed row write instead of rewriting one large pickled value
+
+    tables:
+        -> recency: the last access time of each album, used to evict the least recently used albums
+        -> pending: a work queue of api queries that failed and should be retried later
+        -> aliases: fuzzy song and album keys linked to a stored album, used when the exact keys miss
+    """
+
+    def __init__(self, path):
+        """
+        opens the index database and creates the tables if needed
+
+        @param path: the path of the sqlite database file
+        """
+
+        self.lock = Lock()
+        self.connection = connect(path, check_same_thread=False, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")  # fewer writes to the sd card
+        self.connection.execute("CREATE TABLE IF NOT EXISTS recency (album TEXT PRIMARY KEY, access INTEGER NOT NULL)")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS recency_access ON recency (access)")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS pending ("
+            "title TEXT NOT NULL, artist TEXT NOT NULL, added INTEGER NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, "
+            "next_attempt REAL NOT NULL DEFAULT 0, in_flight INTEGER NOT NULL DEFAULT 0, PRIMARY KEY (title, artist))"
+        )
+        self.connection.execute("CREATE INDEX IF NOT EXISTS pending_next_attempt ON pending (next_attempt)")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS aliases (key TEXT PRIMARY KEY, album TEXT NOT NULL)")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS aliases_album ON aliases (album)")
+        self.connection.execute("UPDATE pending SET in_flight = 0")  # queries in flight when the program exited
+
+        # loads the size and the most recent access time
+        self.size, clock = self.connection.execute("SELECT COUNT(*), MAX(access) FROM recency").fetchone()
+        self.clock = clock or 0
+
+    def tick(self):
+        """
+        gets a unique timestamp that is always later than the previous one so that no two albums share an access time
+
+        @return the timestamp in nanoseconds
+        """
+
+        self.clock = max(time_ns(), self.clock + 1)
+        return self.clock
+
+    def touch(self, album):
+        """
+        marks an album as most recently used, adding it to the table if needed
+
+        @param album: the key of the album to touch
+        """
+
+        with self.lock:
+            access = self.tick()
+            if not self.connection.execute("UPDATE recency SET access = ? WHERE album = ?", (access, album)).rowcount:
+                self.connection.execute("INSERT INTO recency (album, access) VALUES (?, ?)", (album, access))
+                self.size += 1
+
+    def __contains__(self, album):
+        """
+        @param album: the key of the album to check
+
+        @return if the album is tracked by the index
+        """
+
+        with self.lock:
+            return self.connection.execute("SELECT 1 FROM recency WHERE album = ?", (album,)).fetchone() is not None
+
+    def recent(self, limit):
+        """
+        @param limit: the maximum number of albums to get
+
+        @return the keys of the most recently used albums ordered from most to least recent
+        """
+
+        with self.lock:
+            return [album for album, in self.connection.execute("SELECT album FROM recency ORDER BY access DESC LIMIT ?", (limit,))]
+
+    def order(self):
+        """
+        @return the keys of every album ordered from least to most recently used
+        """
+
+        with self.lock:
+            return [album for album, in self.connection.execute("SELECT album FROM recency ORDER BY access")]
+
+    def import_order(self, albums):
+        """
+        adds albums to the table in order of least to most recently used.
+        used to convert the bookkeeping stored by older versions
+
+        @param albums: the album keys ordered from least to most recently used
+        """
+
+        with self.lock:
+            self.connection.execute("BEGIN")
+            for album in albums:
+                self.connection.execute("INSERT OR REPLACE INTO recency (album, access) VALUES (?, ?)", (album, self.tick()))
+            self.connection.execute("COMMIT")
+            self.size = self.connection.execute("SELECT COUNT(*) FROM recency").fetchone()[0]
+
+    def evict(self, limit, remove):
+        """
+        removes the least recently used albums until at most limit albums remain
+
+        @param limit: the maximum number of albums to keep
+        @param remove: a function to remove the albums from the cache before they are removed from the index
+            takes 1 parameter, the list of album keys being evicted
+
+        @return the list of evicted album keys
+        """
+
+        with self.lock:
+            if self.size <= limit:
+                return []
+
+            # finds the oldest albums then deletes them as a single range
+            rows = self.connection.execute("SELECT album, access FROM recency ORDER BY access LIMIT ?", (self.size - limit,)).fetchall()
+            albums = [album for album, _ in rows]
+            remove(albums)
+            self.connection.execute("BEGIN")
+            self.size -= self.connection.execute("DELETE FROM recency WHERE access <= ?", (rows[-1][1],)).rowcount
+            self.connection.executemany("DELETE FROM aliases WHERE album = ?", ((album,) for album in albums))
+            self.connection.execute("COMMIT")
+            return albums
+
+    # ======================================= ALIASES ========================================
+
+    def add_aliases(self, keys, album):
+        """
+        links fuzzy keys to a stored album, replacing any previous links of the keys
+
+        @param keys: the fuzzy keys to link
+        @param album: the key of the album to link them to
+        """
+
+        with self.lock:
+            self.connection.executemany("INSERT OR REPLACE INTO aliases (key, album) VALUES (?, ?)", ((key, album) for key in keys))
+
+    def alias(self, keys):
+        """
+        finds the album linked to any of the fuzzy keys
+
+        @param keys: the fuzzy keys to look up in order of preference
+
+        @return the key of the album or None if no key is linked
+        """
+
+        with self.lock:
+            for key in keys:
+                if row := self.connection.execute("SELECT album FROM aliases WHERE key = ?", (key,)).fetchone():
+                    return row[0]
+
+    # ======================================= PENDING ========================================
+
+    def add_pending(self, title, artist, delay=0):
+        """
+        adds a query to the pending queue, does nothing if it is already queued
+
+        @param title: the title of the track
+        @param artist: the artist of the track
+        @param delay: the number of seconds to wait before the query can be retried
+        """
+
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR IGNORE INTO pending (title, artist, added, next_attempt) VALUES (?, ?, ?, ?)",
+                (title, artist, self.tick(), time() + delay)
+            )
+
+    def take_pending(self, limit):
+        """
+        takes a batch of queries that are ready to be retried and marks them as in flight
+
+        @param limit: the maximum number of queries to take
+
+        @return a list of (title, artist) tuples
+        """
+
+        with self.lock:
+            self.connection.execute("BEGIN")
+            queries = self.connection.execute(
+                "SELECT title, artist FROM pending WHERE in_flight = 0 AND next_attempt <= ? ORDER BY next_attempt, added LIMIT ?",
+                (time(), limit)
+            ).fetchall()
+            self.connection.executemany("UPDATE pending SET in_flight = 1 WHERE title = ? AND artist = ?", queries)
+            self.connection.execute("COMMIT")
+            return queries
+
+    def retry_pending(self, title, artist, delay, max_delay):
+        """
+        returns a failed query to the queue with an exponential backoff
+
+        @param title: the title of the track
+        @param artist: the artist of the track
+        @param delay: the number of seconds to wait after the first failure, doubled for each failed attempt
+        @param max_delay: the maximum number of seconds to wait
+        """
+
+        with self.lock:
+            attempts = self.connection.execute("SELECT attempts FROM pending WHERE title = ? AND artist = ?", (title, artist)).fetchone()
+            attempts = attempts[0] + 1 if attempts else 1
+            self.connection.execute(
+                "UPDATE pending SET attempts = ?, next_attempt = ?, in_flight = 0 WHERE title = ? AND artist = ?",
+                (attempts, time() + min(delay * 2 ** (attempts - 1), max_delay), title, artist)
+            )
+
+    def release_pending(self, queries):
+        """
+        returns queries that were taken but never attempted to the queue
+
+        @param queries: a list of (title, artist) tuples
+        """
+
+        with self.lock:
+            self.connection.executemany("UPDATE pending SET in_flight = 0 WHERE title = ? AND artist = ?", queries)
+
+    def remove_pending(self, title, artist):
+        """
+        removes a query from the pending queue
+
+        @param title: the title of the track
+        @param artist: the artist of the track
+        """
+
+        with self.lock:
+            self.connection.execute("DELETE FROM pending WHERE title = ? AND artist = ?", (title, artist))
+
+    def close(self):
+        """
+        closes the index database
+        """
+
+        with self.lock:
+            self.connection.close()
@@ -0,0 +1,150 @@
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from time import time, sleep
+
+
+class CacheWarmer:
+    """
+    a class to fill the album art cache from a list of tracks ahead of time.
+    several tracks are looked up at once, when an api query fails every thread backs off
+    together since failures are usually caused by rate limiting or a lost connection
+
+    tracks that still fail are added to the pending queries so the dashboard retries them later
+    """
+
+    BACKOFF = (2, 120)  # seconds to wait after the first failed query, and the maximum wait between queries
+    ATTEMPTS = 3  # how many times a track is queried before it is added to the pending queries
+
+    def __init__(self, manager, workers=4):
+        """
+        initializes the warmer
+
+        @param manager: the background job manager whose cache, library and api are used
+        @param workers: the maximum number of tracks to look up at once
+        """
+
+        self.manager = manager
+        self.workers = workers
+        self.lock = Lock()
+        self.failures = 0
+        self.resume = 0  # the time queries can be sent again after a failure
+
+    @staticmethod
+    def read_tracks(path):
+        """
+        reads a track list file, each line can be one of:
+            -> title<tab>artist<tab>album, the album is optional
+            -> artist - title
+            -> #EXTINF:length,artist - title from an m3u playlist
+        other lines, such as comments and file paths in playlists, are skipped
+
+        @param path: the path of the track list file
+
+        @return a list of unique (title, artist, album) tuples in the order they first appear
+        """
+
+        tracks = {}
+        with open(path, encoding="utf-8-sig") as f:
+            for line in f:
+                line = line.strip()
+                if line.startswith("#EXTINF:") and "," in line:
+                    line = line.split(",", 1)[1]
+                elif line.startswith("#") or not line:
+                    continue
+
+                # parses the line
+                if "\t" in line:
+                    title, artist, album = (line.split("\t") + [None])[:3]
+                elif " - " in line:
+                    artist, title = line.split(" - ", 1)
+                    album = None
+                else:
+                    continue
+                title, artist, album = title.strip(), artist.strip(), album.strip() if album else None
+                if title and artist and not tracks.get((title, artist), (None, None, None))[2]:
+                    tracks[title, artist] = (title, artist, album or None)
+        return list(tracks.values())
+
+    def warm(self, tracks, progress=None):
+        """
+        looks up the album art of every track and stores it in the cache
+
+        @param tracks: a list of (title, artist, album) tuples
+        @param progress: a function called after each track is looked up
+            takes 3 parameters, the number of tracks finished, the track and the result of the lookup
+
+        @return a dictionary of each result to the number of tracks with that result
+        """
+
+        results = {"cached": 0, "library": 0, "api": 0, "failed": 0}
+        with ThreadPoolExecutor(self.workers) as pool:
+            futures = [(track, pool.submit(self.warm_track, *track)) for track in tracks]
+            for i, (track, future) in enumerate(futures):
+                try:
+                    result = future.result()
+                except:
+                    result = "failed"
+                results[result] += 1
+                progress(i + 1, track, result) if progress else None
+        return results
+
+    def warm_track(self, title, artist, album=None):
+        """
+        looks up the album art of a track in the following order:
+            -> checks cache
+            -> checks local music library
+            -> attempts api queries, backing off after each failure
+
+        @param title: the title of the track
+        @param artist: the artist of the track
+        @param album: the album of the track
+
+        @return where the art was found: cached, library, api or failed
+        """
+
+        manager = self.manager
+        if manager.cache.fetch(title, artist, album, manager):
+            return "cached"
+
+        # checks local music library
+        if data := manager.library_lookup(title, artist, album):
+            manager.cache.store(*data)
+            return "library"
+
+        # attempts api queries
+        for _ in range(CacheWarmer.ATTEMPTS):
+            self.wait()
+            if data := manager.api.request_data(title, artist, manager.get_token()):
+                if len(data) == 4:
+                    data[3] = manager.format_bytes(data[3])
+                manager.cache.store(*data)
+                self.record(True)
+                return "api"
+            self.record(False)
+
+        # lets the dashboard retry later
+        manager.cache.index.add_pending(title, artist)
+        return "failed"
+
+    def wait(self):
+        """
+        waits until queries can be sent again after a failure
+        """
+
+        while (delay := self.resume - time()) > 0:
+            sleep(delay)
+
+    def record(self, succeeded):
+        """
+        records the result of a query, each failure in a row doubles the time every thread waits
+
+        @param succeeded: whether the query succeeded
+        """
+
+        with self.lock:
+            if succeeded:
+                self.failures = 0
+                return
+            delay, max_delay = CacheWarmer.BACKOFF
+            self.resume = max(self.resume, time() + min(delay * 2 ** self.failures, max_delay))
+            self.failures += 1
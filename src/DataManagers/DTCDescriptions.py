@@ -0,0 +1,87 @@
+from threading import Lock
+from mmap import mmap, ACCESS_READ
+
+
+class DTCDescriptions:
+    """
+    a class to look up the descriptions of manufacturer specific trouble codes python-OBD does not have, such as toyota P1 codes.
+
+    the descriptions are a prebuilt file of fixed width records sorted by code, ie "P1135 A/F Sensor Heater Circuit ...".
+    the file is memory mapped the first time a code is looked up and binary searched, so nothing is read at startup
+    and a lookup only reads the few pages it touches. run build after editing the file to sort and pad the records
+    """
+
+    PATH = "AppData/toyota_dtc.txt"
+    RECORD = 80  # bytes per record including the newline
+    CODE = 5  # bytes of the code at the start of each record
+
+    # class fields
+    index = None
+    lock = Lock()
+
+    @classmethod
+    def get_index(cls):
+        """
+        maps the descriptions file into memory the first time it is needed
+
+        @return the memory mapped file or empty bytes if the file is missing
+        """
+
+        with cls.lock:
+            if cls.index is None:
+                try:
+                    with open(cls.PATH, "rb") as f:
+                        cls.index = mmap(f.fileno(), 0, access=ACCESS_READ)
+                except:
+                    cls.index = b""
+            return cls.index
+
+    @classmethod
+    def lookup(cls, code):
+        """
+        @param code: the trouble code, ie P1135
+
+        @return the description of the code or None if it is not in the file
+        """
+
+        index = cls.get_index()
+        key = code.encode()
+        low, high = 0, len(index) // cls.RECORD
+        while low < high:
+            middle = (low + high) // 2
+            start = middle * cls.RECORD
+            record = index[start:start + cls.CODE]
+            if record == key:
+                return index[start + cls.CODE + 1:start + cls.RECORD].decode().strip()
+            if record < key:
+                low = middle + 1
+            else:
+                high = middle
+        return None
+
+    @classmethod
+    def describe(cls, codes):
+        """
+        fills in the descriptions python-OBD does not have
+
+        @param codes: a list of (code, description) tuples from python-OBD
+
+        @return a list of (code, description) tuples
+        """
+
+        return [(code, description or cls.lookup(code) or "") for code, description in codes]
+
+    @classmethod
+    def build(cls, path=PATH):
+        """
+        sorts and pads the records of a descriptions file so it can be binary searched,
+        records are one code and its description per line in ascii so every character is one byte
+
+        @param path: the path of the descriptions file
+        """
+
+        with open(path, "r", encoding="ascii") as f:
+            records = dict(line.strip().split(" ", 1) for line in f if line.strip())
+        with open(path, "w", encoding="ascii", newline="\n") as f:
+            for code, description in sorted(records.items()):
+                f.write(f"{code} {description.strip()}"[:cls.RECORD - 1].ljust(cls.RECORD - 1) + "\n")
@@ -0,0 +1,94 @@
+from DataManagers.MileManager import MileManger
+from threading import Lock
+from json import load, dump
+from time import strftime, localtime
+
+
+class DTCHistory:
+    """
+    a class to keep the history of every trouble code the car has reported in AppData/dtc_history.json.
+    each code records when and at what mileage it was first seen, last seen and last cleared,
+    the kinds of code it was reported as (stored, pending, permanent) and if it is still active
+    """
+
+    PATH = "AppData/dtc_history.json"
+    KINDS = ("stored", "pending", "permanent")
+
+    def __init__(self):
+        """
+        initializes the history, the file is loaded the first time codes are recorded
+        """
+
+        self.codes = None
+        self.lock = Lock()
+
+    def load(self):
+        """
+        loads the history file if it has not been loaded, must be called while holding the lock
+
+        @return a dictionary of each code to its history
+        """
+
+        if self.codes is None:
+            try:
+                with open(DTCHistory.PATH, "r") as f:
+                    self.codes = load(f)
+            except:
+                self.codes = {}
+        return self.codes
+
+    def record(self, diagnostics, cleared=False):
+        """
+        records the codes that were read and saves the history
+
+        @param diagnostics: the dictionary from OBDAPI.read_diagnostics, kinds of codes that could not be read are None
+        @param cleared: if the codes were cleared before they were read
+        """
+
+        now = strftime("%Y-%m-%d %H:%M:%S", localtime())
+        miles = round(MileManger.current_miles, 1)
+        with self.lock:
+            codes = self.load()
+
+            # marks the active codes as cleared, codes that come back are active again below
+            if cleared:
+                for entry in codes.values():
+                    if entry["active"]:
+                        entry.update({"active": False, "cleared": now, "cleared_miles": miles})
+
+            # updates the codes that were read, kinds that could not be read are None
+            seen = set()
+            unread = {kind for kind in DTCHistory.KINDS if diagnostics[kind] is None}
+            for kind in DTCHistory.KINDS:
+                for code, description in diagnostics[kind] or []:
+                    entry = codes.setdefault(code, {
+                        "description": description,
+                        "first_seen": now,
+                        "first_seen_miles": miles,
+                        "cleared": None,
+                        "cleared_miles": None,
+                        "kinds": []
+                    })
+                    entry.update({"last_seen": now, "last_seen_miles": miles, "active": True})
+                    entry["description"] = description or entry["description"]
+                    if kind not in entry["kinds"]:
+                        entry["kinds"].append(kind)
+                    seen.add(code)
+
+            # codes the car stopped reporting on its own are no longer active, unless they were reported as a kind that could not be read
+            for code, entry in codes.items():
+                if code not in seen and not unread.intersection(entry["kinds"]):
+                    entry["active"] = False
+
+            with open(DTCHistory.PATH, "w") as f:
+                dump(codes, f, indent=4)
+
+    @property
+    def inactive(self):
+        """
+        @return a list of (code, history) tuples of the codes that are no longer active, most recently seen first
+        """
+
+        with self.lock:
+            codes = self.load()
+            return sorted(((code, dict(entry)) for code, entry in codes.items() if not entry["active"]), key=lambda item: item[1]["last_seen"], reverse=True)
@@ -2,6 +2,7 @@ from concurrent.futures import ThreadPoolExecutor
 from time import time
 from subprocess import Popen
 from Connections.NavigationAPI import NavigationAPI
+from Connections.AsyncHTTP import AsyncHTTP
 try:
     from evdev.ecodes import BTN_TOUCH
 except ModuleNotFoundError:
@@ -14,6 +15,8 @@ class FGJobManager(ThreadPoolExecutor):
         --> display sleep job
         --> address search jobs
         --> routing jobs
+
+    address search and routing jobs are sent from the asyncio thread instead of a job thread when the async backend is enabled
     """
 
     def __init__(self, touch_screen):
@@ -51,7 +54,10 @@ class FGJobManager(ThreadPoolExecutor):
         """
 
         self.address_search_future.cancel() if self.address_search_future else None
-        future = self.submit(lambda: FGJobManager.address_search_job(address))
+        if AsyncHTTP.available():
+            future = AsyncHTTP.submit(NavigationAPI.geocode_async(address))
+        else:
+            future = self.submit(lambda: FGJobManager.address_search_job(address))
         future.add_done_callback(lambda f: done(address, f.result()) if not f.cancelled() else None)
         self.address_search_future = future
 
@@ -65,6 +71,13 @@ class FGJobManager(ThreadPoolExecutor):
         @return: a future object for accessing the calculated route later
         """
 
+        if AsyncHTTP.available():
+            future = AsyncHTTP.submit(NavigationAPI.navigate_async(destination))
+        else:
+            future = self.submit(lambda: FGJobManager.routing_job(destination))
+        future.add_done_callback(lambda f: done(destination, f.result()) if not f.cancelled() else None)
+        return future
+
     def start_application(self, callback, command, cwd=None, ignore_shutdown=False):
         """
         start an application and waits for it to finish
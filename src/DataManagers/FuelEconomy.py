@@ -0,0 +1,144 @@
+from AppData import TANK_CAPACITY, AIR_FUEL_RATIO, FUEL_DENSITY
+from numpy import diff, interp, dot
+from json import load, dump
+
+
+class FuelEconomy:
+    """
+    a class to calculate fuel economy from the speed and mass air flow samples of a trip.
+    distance and fuel are integrated over the samples instead of dividing the latest readings,
+    so the values do not spike between readings or divide by zero at idle:
+        -> instant: the last few seconds
+        -> rolling: the last minute
+        -> trip: since the dashboard started, integrated incrementally
+        -> tank: since the last refuel, kept across restarts in AppData/fuel_economy.json
+
+    fuel burned is the air flow divided by the air fuel ratio and the fuel density from the app settings
+    """
+
+    INSTANT_WINDOW = 3  # seconds of samples for the instant fuel economy
+    ROLLING_WINDOW = 60  # seconds of samples for the rolling fuel economy
+    MAX_GAP = 5  # seconds between samples before they are treated as a disconnection and not integrated
+    MAX_MPG = 99.9  # shown while coasting with the fuel cut off
+    REFUEL_RISE = 10  # percent the fuel level must rise to count as a refuel
+    MIN_TANK_MILES = 10  # miles driven on a tank before its fuel economy is used for miles until empty instead of the trip
+    GRAMS_PER_POUND = 453.592
+
+    def __init__(self, trip):
+        """
+        initializes the calculations and loads the tank totals
+
+        @param trip: the trip recorder holding the samples
+        """
+
+        self.trip = trip
+        self.grams_per_gallon = AIR_FUEL_RATIO * FUEL_DENSITY * FuelEconomy.GRAMS_PER_POUND
+        self.last_time = None  # the time of the last speed sample included in the totals
+        self.trip_miles = 0.0
+        self.trip_gallons = 0.0
+
+        # loads the totals since the last refuel
+        try:
+            with open("AppData/fuel_economy.json", "r") as f:
+                tank = load(f)
+            self.tank_miles, self.tank_gallons, self.tank_level = tank["miles"], tank["gallons"], tank["fuel_level"]
+        except:
+            self.tank_miles, self.tank_gallons, self.tank_level = 0.0, 0.0, None
+
+    @staticmethod
+    def integrate_samples(times, values):
+        """
+        integrates samples with the trapezoid rule, gaps longer than MAX_GAP are skipped
+
+        @param times: the times of the samples in seconds
+        @param values: the values of the samples
+
+        @return the integral of the values over time
+        """
+
+        if len(times) < 2:
+            return 0.0
+        dt = diff(times)
+        dt[dt > FuelEconomy.MAX_GAP] = 0
+        return float(dot((values[1:] + values[:-1]) / 2, dt))
+
+    def integrate(self, seconds=None, since=None):
+        """
+        integrates the distance driven and fuel burned over the recent samples
+
+        @param seconds: how many seconds of samples to integrate, None for every sample held
+        @param since: only integrates samples from this time on
+
+        @return a tuple of the miles driven and gallons burned
+        """
+
+        speed_times, mph = self.trip.window("SPEED", seconds)
+        maf_times, maf = self.trip.window("MAF", seconds)
+        if since is not None:
+            start = speed_times.searchsorted(since)
+            speed_times, mph = speed_times[start:], mph[start:]
+
+        # the air flow is resampled at the speed times so both are integrated over the same intervals
+        miles = self.integrate_samples(speed_times, mph) / 3600
+        gallons = self.integrate_samples(speed_times, interp(speed_times, maf_times, maf)) / self.grams_per_gallon if len(maf_times) else 0.0
+        return miles, gallons
+
+    @staticmethod
+    def mpg(miles, gallons):
+        """
+        @param miles: the miles driven
+        @param gallons: the gallons burned
+
+        @return the miles per gallon, capped at MAX_MPG
+        """
+
+        if gallons <= 1e-6:
+            return FuelEconomy.MAX_MPG if miles > 0 else 0.0
+        return min(miles / gallons, FuelEconomy.MAX_MPG)
+
+    def update(self):
+        """
+        adds the samples since the last update to the totals and recalculates the fuel economy
+
+        @return a dictionary of the instant, rolling, trip and tank mpg, the miles until empty
+            and the miles driven since the last update
+        """
+
+        # adds the new samples to the totals
+        miles, gallons = self.integrate(since=self.last_time)
+        speed_times, _ = self.trip.window("SPEED", 0)
+        self.last_time = speed_times[-1] if len(speed_times) else self.last_time
+        self.trip_miles += miles
+        self.trip_gallons += gallons
+        self.tank_miles += miles
+        self.tank_gallons += gallons
+
+        # starts a new tank when the fuel level rises, averaged to ignore fuel sloshing
+        _, levels = self.trip.window("FUEL_LEVEL", FuelEconomy.ROLLING_WINDOW)
+        level = float(levels.mean()) if len(levels) else None
+        if level is not None:
+            if self.tank_level is not None and level - self.tank_level >= FuelEconomy.REFUEL_RISE:
+                self.tank_miles, self.tank_gallons = 0.0, 0.0
+                self.tank_level = level
+            self.tank_level = level if self.tank_level is None else min(self.tank_level, level)
+
+        # calculates the fuel economy
+        trip = self.mpg(self.trip_miles, self.trip_gallons)
+        tank = self.mpg(self.tank_miles, self.tank_gallons)
+        range_mpg = tank if self.tank_miles >= FuelEconomy.MIN_TANK_MILES else trip
+        return {
+            "instant": self.mpg(*self.integrate(FuelEconomy.INSTANT_WINDOW)),
+            "rolling": self.mpg(*self.integrate(FuelEconomy.ROLLING_WINDOW)),
+            "trip": trip,
+            "tank": tank,
+            "miles_until_empty": range_mpg * level / 100 * TANK_CAPACITY if level is not None else 0.0,
+            "miles": miles
+        }
+
+    def save(self):
+        """
+        saves the totals since the last refuel to the fuel_economy.json file
+        """
+
+        with open("AppData/fuel_economy.json", "w") as f:
+            dump({"miles": self.tank_miles, "gallons": self.tank_gallons, "fuel_level": self.tank_level}, f, indent=4)
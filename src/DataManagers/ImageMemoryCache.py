@@ -0,0 +1,118 @@
+from collections import OrderedDict
+from threading import Lock
+
+
+class ImageMemoryCache:
+    """
+    a class to represent a small in memory cache of decoded album art
+    sitting in front of the disk cache. images are evicted in order of
+    least recently used once the total size of the stored images exceeds the limit
+    """
+
+    def __init__(self, max_bytes):
+        """
+        initializes the memory cache
+
+        @param max_bytes: the maximum number of bytes of decoded images to hold in memory
+        """
+
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.images = OrderedDict()
+        self.links = {}  # maps song keys to album keys so songs can be found without the disk cache
+        self.lock = Lock()
+
+    @staticmethod
+    def image_size(image):
+        """
+        estimates the amount of memory a decoded image uses
+
+        @param image: the image to get the size of
+
+        @return the size of the image in bytes
+        """
+
+        return image.width * image.height * len(image.getbands())
+
+    def get(self, album, song=None):
+        """
+        attempts to read an image from memory and marks it as most recently used
+
+        @param album: the key of the album to read
+        @param song: the key of the song, used when the album is not known
+
+        @return a tuple of the key of the album that was found and the image or None if it is not stored in memory
+        """
+
+        with self.lock:
+            album = album if album in self.images else self.links.get(song)
+            if album is None or album not in self.images:
+                self.misses += 1
+                return None
+
+            # marks as most recently used
+            self.hits += 1
+            self.images.move_to_end(album)
+            return album, self.images[album]
+
+    def put(self, album, image, song=None):
+        """
+        stores an image in memory and evicts the least recently used images if needed
+
+        @param album: the key of the album to store
+        @param image: the decoded image
+        @param song: the key of the song to link to the album
+        """
+
+        size = self.image_size(image)
+        if size > self.max_bytes:
+            return
+
+        with self.lock:
+            if song:
+                self.links[song] = album
+
+            # replaces the old image if it exists
+            if album in self.images:
+                self.size -= self.image_size(self.images.pop(album))
+            self.images[album] = image
+            self.size += size
+
+            # evicts least recently used images
+            while self.size > self.max_bytes:
+                evicted, evicted_image = self.images.popitem(last=False)
+                self.size -= self.image_size(evicted_image)
+                self.links = {s: a for s, a in self.links.items() if a != evicted}
+
+    def unlink(self, song):
+        """
+        removes the link of a song to an album
+
+        @param song: the key of the song to unlink
+        """
+
+        with self.lock:
+            self.links.pop(song, None)
+
+    def pop(self, album):
+        """
+        removes an album from memory
+
+        @param album: the key of the album to remove
+        """
+
+        with self.lock:
+            if album in self.images:
+                self.size -= self.image_size(self.images.pop(album))
+                self.links = {s: a for s, a in self.links.items() if a != album}
+
+    @property
+    def stats(self):
+        """
+        @return a dictionary containing the hit/miss counters and memory usage
+        """
+
+        with self.lock:
+            return {"hits": self.hits, "misses": self.misses, "albums": len(self.images), "bytes": self.size}
@@ -0,0 +1,122 @@
+from AppData import ALBUM_ART_RESOLUTION
+from io import BytesIO
+from time import perf_counter
+from threading import Lock
+from PIL.Image import open as open_img, new as new_img, frombytes, merge, Resampling
+from PIL.ImageDraw import Draw
+
+
+class ImagePipeline:
+    """
+    a class to format downloaded album art to the album art resolution with rounded corners.
+    the stages are:
+        -> decode: jpegs are decoded at the smallest scale that is still at least the album art resolution
+        -> resize: resized to the album art resolution in a single pass
+        -> mask: the precomputed rounded corner mask is merged in as the alpha band
+
+    optionally runs in a pool of processes so formatting does not compete with the UI for the GIL
+    """
+
+    SIZE = (ALBUM_ART_RESOLUTION, ALBUM_ART_RESOLUTION)
+    STAGES = ("decode", "resize", "mask")
+
+    # precomputed alpha band for the rounded corners
+    mask = new_img("L", SIZE, 0)
+    Draw(mask).rounded_rectangle([0, 0, ALBUM_ART_RESOLUTION, ALBUM_ART_RESOLUTION], radius=12, fill=255)
+
+    def __init__(self, processes=0):
+        """
+        initializes the pipeline
+
+        @param processes: the number of processes to format images in, 0 to format in the calling thread
+        """
+
+        self.pool = None
+        if processes:
+            from concurrent.futures import ProcessPoolExecutor  # lazy loaded for performance
+            from multiprocessing import get_context
+            self.pool = ProcessPoolExecutor(processes, mp_context=get_context("spawn"))  # forking a multithreaded program is unsafe
+        self.timings = {stage: [0, 0.0] for stage in ImagePipeline.STAGES}  # stage: [count, total seconds]
+        self.lock = Lock()
+
+    @classmethod
+    def process(cls, image_bytes):
+        """
+        runs every stage of the pipeline
+
+        @param image_bytes: the encoded image to format
+
+        @return a tuple of the formatted image and a dictionary of the seconds spent in each stage
+        """
+
+        # decodes at a reduced scale when possible
+        start = perf_counter()
+        image = open_img(BytesIO(image_bytes))
+        image.draft("RGB", cls.SIZE)
+        image = image.convert("RGB") if image.mode != "RGB" else image
+        image.load()
+        decoded = perf_counter()
+
+        # resizes and adds the rounded corners
+        image = image.resize(cls.SIZE, Resampling.BICUBIC, reducing_gap=2.0)
+        resized = perf_counter()
+        image = merge("RGBA", (*image.split(), cls.mask))
+        masked = perf_counter()
+
+        return image, {"decode": decoded - start, "resize": resized - decoded, "mask": masked - resized}
+
+    @classmethod
+    def process_raw(cls, image_bytes):
+        """
+        runs every stage of the pipeline in a worker process
+
+        @param image_bytes: the encoded image to format
+
+        @return a tuple of the formatted image as raw RGBA bytes and a dictionary of the seconds spent in each stage
+        """
+
+        image, timings = cls.process(image_bytes)
+        return image.tobytes(), timings
+
+    def format(self, image_bytes):
+        """
+        formats an image to the album art resolution and adds rounded corners
+
+        @param image_bytes: the encoded image to format
+
+        @return the formatted image
+        """
+
+        # formats the image
+        if self.pool:
+            raw, timings = self.pool.submit(ImagePipeline.process_raw, image_bytes).result()
+            image = frombytes("RGBA", ImagePipeline.SIZE, raw)
+        else:
+            image, timings = ImagePipeline.process(image_bytes)
+
+        # records the stage timings
+        with self.lock:
+            for stage, seconds in timings.items():
+                self.timings[stage][0] += 1
+                self.timings[stage][1] += seconds
+        return image
+
+    @property
+    def stats(self):
+        """
+        @return a dictionary of each stage to its count and average milliseconds
+        """
+
+        with self.lock:
+            return {
+                stage: {"count": count, "average_ms": round(total / count * 1000, 2) if count else 0}
+                for stage, (count, total) in self.timings.items()
+            }
+
+    def shutdown(self):
+        """
+        shuts down the process pool if there is one
+        """
+
+        if self.pool:
+            self.pool.shutdown(cancel_futures=True)
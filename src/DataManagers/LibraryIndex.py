@@ -0,0 +1,195 @@
+from DataManagers.TrackKeys import TrackKeys
+from sqlite3 import connect
+from threading import Lock
+from os import walk, listdir
+from os.path import join, getmtime, splitext, dirname, expanduser, exists
+from base64 import b64decode
+
+
+class LibraryIndex:
+    """
+    a class to find album art for tracks in a local music directory so art can be shown without an internet connection.
+    art is looked up by normalized title/artist or album/artist in the following order:
+        -> an image in the folder of the track (cover.jpg, folder.jpg, etc)
+        -> art embedded in the track (ID3, FLAC, MP4 and Ogg tags)
+
+    reading tags requires the optional mutagen module, without it the index is empty
+    """
+
+    AUDIO_EXTENSIONS = {".mp3", ".flac", ".m4a", ".mp4", ".aac", ".ogg", ".opus"}
+    FOLDER_IMAGES = ("cover.jpg", "cover.png", "folder.jpg", "folder.png", "front.jpg", "front.png", "album.jpg", "album.png")
+
+    def __init__(self, directory, path):
+        """
+        opens the index database and creates the tables if needed
+
+        @param directory: the music directory to index, None to disable the index
+        @param path: the path of the sqlite database file
+        """
+
+        self.directory = expanduser(directory) if directory else None
+        self.lock = Lock()
+        self.connection = connect(path, check_same_thread=False, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, modified REAL NOT NULL)")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS tracks (key TEXT NOT NULL, path TEXT NOT NULL, album TEXT, PRIMARY KEY (key, path))")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS tracks_path ON tracks (path)")
+
+        # tracks indexed by older versions without key prefixes are indexed again on the next scan
+        self.connection.execute("DELETE FROM files WHERE path IN (SELECT path FROM tracks WHERE key NOT LIKE 'songs:%' AND key NOT LIKE 'albums:%')")
+        self.connection.execute("DELETE FROM tracks WHERE key NOT LIKE 'songs:%' AND key NOT LIKE 'albums:%'")
+
+    def scan(self, stop=lambda: False):
+        """
+        indexes new and modified tracks in the music directory and removes deleted tracks.
+        unmodified tracks are skipped so only the first scan is slow
+
+        @param stop: a function that returns True when the scan should stop early
+
+        @return the number of tracks that were indexed
+        """
+
+        if not (self.directory and exists(self.directory)):
+            return 0
+
+        # lazy loaded for performance, the index stays empty without it
+        try:
+            from mutagen import File
+        except ModuleNotFoundError:
+            return 0
+
+        # loads the modification times from the last scan
+        with self.lock:
+            known = dict(self.connection.execute("SELECT path, modified FROM files"))
+        seen = set()
+        indexed = 0
+
+        # indexes the new and modified tracks
+        for root, _, files in walk(self.directory):
+            for name in files:
+                if stop():
+                    return indexed
+                path = join(root, name)
+                if splitext(name)[1].lower() not in LibraryIndex.AUDIO_EXTENSIONS:
+                    continue
+                seen.add(path)
+                try:
+                    modified = getmtime(path)
+                    if known.get(path) == modified:
+                        continue
+                    tags = File(path, easy=True) or {}
+                except:
+                    continue
+
+                # links the song and album keys to the track
+                title, artist, album = (tags.get(tag, [None])[0] for tag in ("title", "artist", "album"))
+                keys = [LibraryIndex.song_key(title, artist)] if title and artist else []
+                keys += [LibraryIndex.album_key(album, artist)] if album and artist else []
+                with self.lock:
+                    self.connection.execute("BEGIN")
+                    self.connection.execute("DELETE FROM tracks WHERE path = ?", (path,))
+                    self.connection.executemany("INSERT OR IGNORE INTO tracks (key, path, album) VALUES (?, ?, ?)", [(key, path, album) for key in keys])
+                    self.connection.execute("INSERT OR REPLACE INTO files (path, modified) VALUES (?, ?)", (path, modified))
+                    self.connection.execute("COMMIT")
+                indexed += 1
+
+        # removes the deleted tracks
+        with self.lock:
+            deleted = [(path,) for path in known if path not in seen]
+            self.connection.execute("BEGIN")
+            self.connection.executemany("DELETE FROM tracks WHERE path = ?", deleted)
+            self.connection.executemany("DELETE FROM files WHERE path = ?", deleted)
+            self.connection.execute("COMMIT")
+        return indexed
+
+    @staticmethod
+    def song_key(title, artist):
+        """
+        @param title: the title of the track
+        @param artist: the artist of the track
+
+        @return the key of the song, prefixed so it can not match an album key
+        """
+
+        return f"songs:{TrackKeys.song(title, artist)}"
+
+    @staticmethod
+    def album_key(album, artist):
+        """
+        @param album: the album of the track
+        @param artist: the artist of the track
+
+        @return the key of the album, prefixed so it can not match a song key
+        """
+
+        return f"albums:{TrackKeys.album(album, artist)}"
+
+    def lookup(self, title, artist, album=None):
+        """
+        attempts to find the album art of a track in the music directory
+
+        @param title: the title of the track
+        @param artist: the artist of the track
+        @param album: the album of the track
+
+        @return a tuple of the album name and the encoded art or None if it is not found
+        """
+
+        if not self.directory:
+            return None
+
+        # finds tracks matching the song or album
+        keys = (LibraryIndex.song_key(title, artist), LibraryIndex.album_key(album, artist) if album else None)
+        with self.lock:
+            rows = self.connection.execute("SELECT path, album FROM tracks WHERE key IN (?, ?)", keys).fetchall()
+
+        # reads the art of the first track that has any
+        for path, album_name in rows:
+            if art := self.read_art(path):
+                return album_name, art
+
+    @classmethod
+    def read_art(cls, path):
+        """
+        reads the album art of a track from its folder or its tags
+
+        @param path: the path of the track
+
+        @return the encoded art or None if the track has none
+        """
+
+        # checks the folder of the track, ignoring the casing of the image names (ie Cover.jpg)
+        folder = dirname(path)
+        try:
+            names = {name.lower(): name for name in listdir(folder)}
+        except:
+            names = {}
+        for name in cls.FOLDER_IMAGES:
+            if name in names:
+                with open(join(folder, names[name]), "rb") as f:
+                    return f.read()
+
+        # checks the tags of the track
+        try:
+            from mutagen import File
+            track = File(path)
+            tags = track.tags
+            if hasattr(tags, "getall") and (pictures := tags.getall("APIC")):  # mp3
+                return pictures[0].data
+            if getattr(track, "pictures", None):  # flac
+                return track.pictures[0].data
+            if "covr" in tags:  # mp4
+                return bytes(tags["covr"][0])
+            if "metadata_block_picture" in tags:  # ogg
+                from mutagen.flac import Picture
+                return Picture(b64decode(tags["metadata_block_picture"][0])).data
+        except:
+            return None
+
+    def close(self):
+        """
+        closes the index database
+        """
+
+        with self.lock:
+            self.connection.close()
@@ -0,0 +1,288 @@
+from threading import Thread, Condition
+from json import load, dump
+from time import time, perf_counter
+
+
+class OBDReconnector:
+    """
+    a class to keep the obd connection alive from a background thread, moving between these states:
+        -> last port: reopens the port, baud rate and protocol that last worked, skipping the port scan and protocol search
+        -> scanning: scans every serial port and searches for the protocol, tried when the last port fails
+        -> no adapter: no adapter answered, waits with an exponential backoff before trying again
+        -> ignition off: the adapter answers but the car does not, the open port is polled for the ignition
+            (AT IGN, or a change in the battery voltage from AT RV) and the car is only asked
+            with an exponential backoff so the car is reconnected within a second of the ignition turning on
+        -> connected: waits until the obd read thread reports a disconnect
+
+    the last working connection is saved to AppData/obd_connection.json so it is tried first after a restart
+    """
+
+    PATH = "AppData/obd_connection.json"
+    BACKOFF = (1, 30)  # seconds to wait after the first failed attempt, and the maximum wait between attempts
+    POLL_INTERVAL = .5  # seconds between ignition polls while the car is off
+    VOLTAGE_STEP = .2  # volts the battery must change by between polls to ask the car
+
+    # states
+    IDLE = "idle"
+    LAST_PORT = "last port"
+    SCANNING = "scanning"
+    NO_ADAPTER = "no adapter"
+    IGNITION_OFF = "ignition off"
+    CONNECTED = "connected"
+
+    def __init__(self, lock):
+        """
+        initializes the reconnector, the reconnect thread is started on the first disconnect
+
+        @param lock: the lock held while the connection is changed so it does not overlap shutting down
+        """
+
+        self.lock = lock
+        self.condition = Condition()
+        self.thread = None
+        self.stopped = False
+        self.obd = None
+        self.state = OBDReconnector.IDLE
+        self.failures = 0
+        self.scan_next = False
+        self.voltage = None
+        self.next_probe = 0
+
+        # loads the last working connection
+        try:
+            with open(OBDReconnector.PATH, "r") as f:
+                self.last = load(f)
+        except:
+            self.last = None
+
+        # metrics
+        self.disconnected = None
+        self.attempts = {}  # state: [attempts, total seconds, slowest seconds]
+        self.reconnects = {}  # state that connected: count
+        self.downtime = 0.0
+        self.max_downtime = 0.0
+        self.last_error = None
+
+    def reconnect(self, obd):
+        """
+        starts reconnecting, called when connecting for the first time and when the obd read thread disconnects
+
+        @param obd: the obd api instance to connect
+        """
+
+        with self.condition:
+            if self.stopped:
+                return
+            self.obd = obd
+            self.disconnected = self.disconnected or perf_counter()
+            self.failures = 0
+            self.next_probe = 0
+            if self.thread is None:
+                self.thread = Thread(target=self.reconnect_loop, daemon=True)
+                self.thread.start()
+            self.condition.notify_all()
+
+    def reconnect_loop(self):
+        """
+        the loop of the reconnect thread, steps the state machine until connected then waits for the next disconnect
+        """
+
+        while True:
+
+            # waits for a disconnect
+            with self.condition:
+                self.condition.wait_for(lambda: self.stopped or self.obd is not None)
+                if self.stopped:
+                    return
+                obd = self.obd
+
+            # steps the state machine
+            with self.lock:
+                if self.stopped:
+                    return
+                try:
+                    delay = self.step(obd)
+                except Exception as e:
+                    self.last_error = f"{self.state}: {e!r}"
+                    delay = self.backoff()
+
+            # waits for the next step, or the next disconnect once connected
+            with self.condition:
+                if delay is None:
+                    self.obd = None
+                else:
+                    self.condition.wait_for(lambda: self.stopped, delay)
+
+    def step(self, obd):
+        """
+        makes one connection attempt
+
+        @param obd: the obd api instance to connect
+
+        @return the seconds to wait before the next attempt or None if the car is connected
+        """
+
+        from obd import Async, OBDStatus  # lazy loaded for performance
+
+        # polls the ignition while the adapter is open
+        interface = getattr(obd, "interface", None)
+        if interface is not None and interface.status() != OBDStatus.NOT_CONNECTED:
+            self.state = OBDReconnector.IGNITION_OFF
+            return self.poll_ignition(obd)
+
+        # opens the last working port, or scans for the adapter when that fails
+        if interface is not None:
+            interface.close()
+        if self.last and not self.scan_next:
+            self.state = OBDReconnector.LAST_PORT
+            self.timed(lambda: Async.__init__(obd, self.last["port"], self.last["baudrate"], self.last["protocol"]))
+        else:
+            self.state = OBDReconnector.SCANNING
+            self.timed(lambda: Async.__init__(obd))
+        self.scan_next = self.state == OBDReconnector.LAST_PORT and obd.status() == OBDStatus.NOT_CONNECTED
+
+        # starts reading once the car answers
+        if obd.is_connected():
+            self.connected(obd)
+            return None
+        if obd.status() != OBDStatus.NOT_CONNECTED:
+            self.state = OBDReconnector.IGNITION_OFF
+            return OBDReconnector.POLL_INTERVAL
+        self.state = OBDReconnector.NO_ADAPTER
+        return 0 if self.scan_next else self.backoff()
+
+    def poll_ignition(self, obd):
+        """
+        polls the adapter for the ignition and asks the car when it may have turned on
+
+        @param obd: the obd api instance with the open adapter
+
+        @return the seconds to wait before the next poll or None if the car is connected
+        """
+
+        from obd import OBDStatus  # lazy loaded for performance
+
+        # reads the ignition pin and battery voltage, adapters without an ignition pin answer ?
+        send = obd.interface._ELM327__send
+        ignition = " ".join(send(b"ATIGN"))
+        try:
+            voltage = float(" ".join(send(b"ATRV")).lower().replace("v", ""))
+        except ValueError:
+            voltage = None
+        if obd.status() == OBDStatus.NOT_CONNECTED:
+            return 0  # the adapter was unplugged
+
+        # asks the car when the ignition turns on, the voltage changes or the backoff expires
+        changed = voltage is not None and self.voltage is not None and abs(voltage - self.voltage) >= OBDReconnector.VOLTAGE_STEP
+        self.voltage = voltage
+        if "ON" in ignition or changed or time() >= self.next_probe:
+            if self.timed(lambda: self.probe_car(obd)):
+                self.connected(obd)
+                return None
+            self.next_probe = time() + self.backoff()
+        return OBDReconnector.POLL_INTERVAL
+
+    def probe_car(self, obd):
+        """
+        asks the car for its supported pids over the open adapter, a quick request when the protocol is known
+
+        @param obd: the obd api instance with the open adapter
+
+        @return if the car answered
+        """
+
+        from obd import OBDStatus  # lazy loaded for performance
+
+        # set_protocol also succeeds on NO DATA so the car must answer with data
+        protocol = self.last["protocol"] if self.last else None
+        if not obd.interface.set_protocol(protocol) or not any(message.data for message in obd.interface.send_and_parse(b"0100") or []):
+            return False
+        obd.interface._ELM327__status = OBDStatus.CAR_CONNECTED
+        obd._OBD__load_commands()
+        return True
+
+    def timed(self, attempt):
+        """
+        runs a connection attempt and records how long it took under the current state
+
+        @param attempt: the function making the attempt
+
+        @return the result of the attempt
+        """
+
+        start = perf_counter()
+        try:
+            return attempt()
+        finally:
+            elapsed = perf_counter() - start
+            attempts = self.attempts.setdefault(self.state, [0, 0.0, 0.0])
+            attempts[0] += 1
+            attempts[1] += elapsed
+            attempts[2] = max(attempts[2], elapsed)
+
+    def backoff(self):
+        """
+        @return the seconds to wait after another failed attempt
+        """
+
+        delay, max_delay = OBDReconnector.BACKOFF
+        self.failures += 1
+        return min(delay * 2 ** (self.failures - 1), max_delay)
+
+    def connected(self, obd):
+        """
+        saves the working connection and starts reading pids
+
+        @param obd: the connected obd api instance
+        """
+
+        # saves the baud rate before the adapter is tuned since the adapter resets to it on the next connect
+        last = {"port": obd.interface.port_name(), "baudrate": obd.interface._ELM327__port.baudrate, "protocol": obd.interface.protocol_id()}
+        if last != self.last:
+            self.last = last
+            try:
+                with open(OBDReconnector.PATH, "w") as f:
+                    dump(last, f, indent=4)
+            except:
+                pass
+
+        # records the time it took to reconnect
+        self.reconnects[self.state] = self.reconnects.get(self.state, 0) + 1
+        if self.disconnected is not None:
+            downtime = perf_counter() - self.disconnected
+            self.downtime += downtime
+            self.max_downtime = max(self.max_downtime, downtime)
+            self.disconnected = None
+        self.state = OBDReconnector.CONNECTED
+        self.failures = 0
+        self.voltage = None
+
+        obd.watch_schedule()
+        obd.tune_adapter()
+        obd.start()
+
+    @property
+    def metrics(self):
+        """
+        @return a dictionary of the state, the attempts of each state with their average and slowest milliseconds,
+            the reconnects from each state, the average and longest seconds without a connection and the last error
+        """
+
+        connects = sum(self.reconnects.values())
+        return {
+            "state": self.state,
+            "attempts": {state: {"count": count, "average_ms": round(total / count * 1000, 1), "max_ms": round(slowest * 1000, 1)} for state, (count, total, slowest) in self.attempts.items()},
+            "reconnects": dict(self.reconnects),
+            "average_downtime_s": round(self.downtime / connects, 2) if connects else 0,
+            "max_downtime_s": round(self.max_downtime, 2),
+            "last_error": self.last_error
+        }
+
+    def stop(self):
+        """
+        stops the reconnect thread
+        """
+
+        with self.condition:
+            self.stopped = True
+            self.condition.notify_all()
@@ -0,0 +1,31 @@
+class OBDSnapshot:
+    """
+    a class to hand the latest obd values from the obd thread to the UI without queuing Tk events.
+    the obd thread is the only writer, each publish builds a new dictionary and swaps it in with a single
+    assignment so the UI always reads a complete snapshot without locking, and only when it draws a frame
+    """
+
+    def __init__(self):
+        """
+        initializes the empty snapshot
+        """
+
+        self.snapshot = (0, {})  # (version, values), replaced as a whole and never changed in place
+
+    def publish(self, values):
+        """
+        publishes new values, must only be called from the obd thread
+
+        @param values: a dictionary of the names and values that changed
+        """
+
+        version, current = self.snapshot
+        self.snapshot = (version + 1, {**current, **values})
+
+    @property
+    def latest(self):
+        """
+        @return a tuple of the version of the snapshot and a dictionary of the latest values, the dictionary must not be changed
+        """
+
+        return self.snapshot
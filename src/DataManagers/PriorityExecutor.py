@@ -0,0 +1,166 @@
+from concurrent.futures import Executor, Future
+from collections import deque
+from threading import Thread, Condition
+from os import cpu_count
+
+
+class PriorityExecutor(Executor):
+    """
+    a thread pool that runs jobs in order of priority instead of in the order they were submitted.
+    each priority class can be limited to a number of concurrently running jobs so that
+    low priority work can never occupy every thread
+    """
+
+    # priority classes, lower values run first
+    INTERACTIVE = 0  # work the user is waiting on, such as the album art on screen
+    OBD = 1  # obd connection and diagnostic jobs
+    MAINTENANCE = 2  # cache bookkeeping such as touches and stores
+    PREFETCH = 3  # speculative work such as prefetching and pending queries
+    NAMES = {INTERACTIVE: "interactive", OBD: "obd", MAINTENANCE: "maintenance", PREFETCH: "prefetch"}
+
+    def __init__(self, max_workers=None, limits=None):
+        """
+        initializes the executor, threads are started as jobs are submitted
+
+        @param max_workers: the maximum number of threads, defaults to the same as a ThreadPoolExecutor
+        @param limits: a dictionary of priority class to the maximum number of its jobs that can run at once
+            classes that are not included are not limited
+        """
+
+        self.max_workers = max_workers or min(32, (cpu_count() or 1) + 4)
+        self.limits = limits or {}
+        self.queues = {priority: deque() for priority in PriorityExecutor.NAMES}
+        self.running = {priority: 0 for priority in PriorityExecutor.NAMES}
+        self.completed = {priority: 0 for priority in PriorityExecutor.NAMES}
+        self.max_queued = {priority: 0 for priority in PriorityExecutor.NAMES}
+        self.threads = []
+        self.idle = 0
+        self.wakeups = 0  # idle threads that were notified but have not woken up yet
+        self.condition = Condition()
+        self._shutdown = False
+
+    def submit(self, fn, /, *args, **kwargs):
+        """
+        submits a job with interactive priority
+
+        @param fn: the function to run
+        @param args: the arguments for the function
+        @param kwargs: the keyword arguments for the function
+
+        @return a future object to access the results of the job when completed
+        """
+
+        return self.submit_priority(PriorityExecutor.INTERACTIVE, fn, *args, **kwargs)
+
+    def submit_priority(self, priority, fn, /, *args, **kwargs):
+        """
+        submits a job with the given priority
+
+        @param priority: the priority class of the job
+        @param fn: the function to run
+        @param args: the arguments for the function
+        @param kwargs: the keyword arguments for the function
+
+        @return a future object to access the results of the job when completed
+        """
+
+        with self.condition:
+            if self._shutdown:
+                raise RuntimeError("cannot schedule new futures after shutdown")
+
+            # queues the job
+            future = Future()
+            queue = self.queues[priority]
+            queue.append((future, fn, args, kwargs))
+            self.max_queued[priority] = max(self.max_queued[priority], len(queue))
+
+            # wakes a free thread or starts a new one if every free thread was already woken for another job
+            if self.idle > self.wakeups:
+                self.wakeups += 1
+                self.condition.notify()
+            elif len(self.threads) < self.max_workers:
+                thread = Thread(target=self.worker, daemon=True)
+                thread.start()
+                self.threads.append(thread)
+            return future
+
+    def next_job(self):
+        """
+        takes the highest priority job whose class is below its running limit.
+        must be called while holding the condition
+
+        @return a (priority, future, fn, args, kwargs) tuple or None if no job can run
+        """
+
+        for priority, queue in self.queues.items():
+            limit = self.limits.get(priority)
+            if queue and (limit is None or self.running[priority] < limit):
+                self.running[priority] += 1
+                return priority, *queue.popleft()
+
+    def worker(self):
+        """
+        the loop of each thread, runs jobs until the executor is shut down and no jobs are left
+        """
+
+        while True:
+
+            # waits for a job that is allowed to run
+            with self.condition:
+                while (job := self.next_job()) is None:
+                    if self._shutdown and not any(self.queues.values()):
+                        return
+                    self.idle += 1
+                    self.condition.wait()
+                    self.idle -= 1
+                    self.wakeups = max(self.wakeups - 1, 0)
+
+            # runs the job
+            priority, future, fn, args, kwargs = job
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(fn(*args, **kwargs))
+                except BaseException as e:
+                    future.set_exception(e)
+
+            # a limited class may now be able to run
+            with self.condition:
+                self.running[priority] -= 1
+                self.completed[priority] += 1
+                self.condition.notify_all()
+
+    @property
+    def metrics(self):
+        """
+        @return a dictionary of each priority class name to its queue depth, most jobs ever queued, running and completed jobs
+        """
+
+        with self.condition:
+            return {
+                name: {
+                    "queued": len(self.queues[priority]),
+                    "max_queued": self.max_queued[priority],
+                    "running": self.running[priority],
+                    "completed": self.completed[priority]
+                } for priority, name in PriorityExecutor.NAMES.items()
+            }
+
+    def shutdown(self, wait=True, *, cancel_futures=False):
+        """
+        stops accepting jobs and optionally cancels the jobs that have not started yet
+
+        @param wait: whether to wait for the running jobs to finish
+        @param cancel_futures: whether to cancel the queued jobs
+        """
+
+        with self.condition:
+            self._shutdown = True
+            if cancel_futures:
+                for queue in self.queues.values():
+                    while queue:
+                        queue.popleft()[0].cancel()
+            self.condition.notify_all()
+
+        if wait:
+            for thread in self.threads:
+                thread.join()
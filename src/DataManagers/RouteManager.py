@@ -22,7 +22,7 @@ class RouteManager:
     except:
         routes = {"saved": {}}
 
-    def __init__(self, name, lat, lon, audio_api):
+    def __init__(self, name, lat, lon, audio_api, navigation=None):
         """
         creates the route object
 
@@ -30,13 +30,14 @@ class RouteManager:
         @param lat: the latitude of the destination
         @param lon: the longitude of the destination
         @param audio_api: the audio api for instruction tts
+        @param navigation: the route from a routing job, the route is requested if it is not given
         """
 
         # fields
         self.name = name
         self.coords = (lat, lon)
         self.audio_api = audio_api
-        navigation = NavigationAPI.navigate(self.coords)
+        navigation = navigation or NavigationAPI.navigate(self.coords)
         self.path = [(lat, lon) for lon, lat in navigation["points"]["coordinates"]]
         self.distance = navigation["distance"]
         self.time = navigation["time"]
@@ -0,0 +1,95 @@
+from numpy import zeros, float64, concatenate, searchsorted
+from threading import Lock
+
+
+class SampleBuffer:
+    """
+    a class to hold the most recent timestamped samples of a single obd pid in fixed size arrays.
+    new samples overwrite the oldest ones so memory never grows no matter how long the trip is,
+    samples that have not been written to the trip file yet are tracked so they can be flushed in one block
+    """
+
+    def __init__(self, capacity):
+        """
+        initializes the empty buffer
+
+        @param capacity: the maximum number of samples to hold
+        """
+
+        self.capacity = capacity
+        self.times = zeros(capacity, float64)
+        self.values = zeros(capacity, float64)
+        self.count = 0  # the number of samples ever appended
+        self.flushed = 0  # the number of samples ever flushed
+        self.lock = Lock()
+
+    def append(self, time, value):
+        """
+        adds a sample, overwriting the oldest sample if the buffer is full
+
+        @param time: the time of the sample in seconds since the epoch
+        @param value: the value of the sample
+        """
+
+        with self.lock:
+            i = self.count % self.capacity
+            self.times[i] = time
+            self.values[i] = value
+            self.count += 1
+
+    def ordered(self, start):
+        """
+        gets samples in chronological order, must be called while holding the lock
+
+        @param start: the number of the first sample to get, samples that were overwritten are skipped
+
+        @return a tuple of copies of the times and values arrays
+        """
+
+        start = max(start, self.count - self.capacity)
+        first, last = start % self.capacity, self.count % self.capacity
+        if start == self.count:
+            return self.times[:0].copy(), self.values[:0].copy()
+        if first < last:
+            return self.times[first:last].copy(), self.values[first:last].copy()
+        return concatenate((self.times[first:], self.times[:last])), concatenate((self.values[first:], self.values[:last]))
+
+    def window(self, seconds=None):
+        """
+        gets the most recent samples
+
+        @param seconds: how many seconds of samples to get counting back from the latest sample, None for every sample held
+
+        @return a tuple of the times and values arrays in chronological order
+        """
+
+        with self.lock:
+            times, values = self.ordered(0)
+        if seconds is not None and len(times):
+            start = searchsorted(times, times[-1] - seconds)
+            times, values = times[start:], values[start:]
+        return times, values
+
+    def unflushed(self):
+        """
+        gets the samples that have not been flushed and marks them as flushed
+
+        @return a tuple of the times and values arrays in chronological order
+        """
+
+        with self.lock:
+            times, values = self.ordered(self.flushed)
+            self.flushed = self.count
+        return times, values
+
+    @property
+    def latest(self):
+        """
+        @return a tuple of the time and value of the latest sample or None if there are no samples
+        """
+
+        with self.lock:
+            if not self.count:
+                return None
+            i = (self.count - 1) % self.capacity
+            return self.times[i], self.values[i]
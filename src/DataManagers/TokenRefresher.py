@@ -0,0 +1,142 @@
+from AppData import NETWORK_TIMEOUT
+from threading import Thread, Condition
+from time import time, perf_counter
+
+
+class TokenRefresher:
+    """
+    a class to keep an api token fresh by renewing it on a background thread before it expires.
+    the current token keeps being served while it is renewed so jobs never wait on a refresh,
+    failed refreshes are never stored and are retried with an exponential backoff
+
+    jobs only wait when there is no valid token at all, such as on the first lookup
+    """
+
+    REFRESH_AHEAD = 300  # seconds before the token expires to renew it
+    RETRY_BACKOFF = (5, 300)  # seconds to wait after the first failed refresh, and the maximum wait between refreshes
+
+    def __init__(self, request, cache):
+        """
+        loads the stored token, the refresh thread is started on first use so no requests are sent until a token is needed
+
+        @param request: a function to request a new token
+            takes no parameters and returns the json response, {"access_token": ..., "expires_in": ...}
+        @param cache: the cache to store the token in so it survives restarts
+        """
+
+        self.request = request
+        self.cache = cache
+        self.condition = Condition()
+        self.thread = None
+        self.stopped = False
+
+        # loads the stored token
+        self.token, expires = cache.get("token", expire_time=True)
+        self.expires = expires or 0
+        self.next_refresh = self.expires - TokenRefresher.REFRESH_AHEAD
+        self.refreshing = False
+        self.failures = 0
+
+        # metrics
+        self.attempts = 0
+        self.failed = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+
+    def valid(self):
+        """
+        must be called while holding the condition
+
+        @return if the current token has not expired
+        """
+
+        return self.token is not None and time() < self.expires
+
+    def get(self):
+        """
+        gets the current token, waiting for a refresh only if there is no valid token and one is not backing off
+
+        @return the token or None if there is no valid token
+        """
+
+        with self.condition:
+            if self.thread is None and not self.stopped:
+                self.thread = Thread(target=self.refresh_loop, daemon=True)
+                self.thread.start()
+
+            # waits for the refresh that is running or due to finish
+            if not self.valid() and (self.refreshing or self.next_refresh <= time()):
+                attempts = self.attempts
+                self.condition.notify_all()
+                self.condition.wait_for(lambda: self.attempts != attempts or self.stopped, NETWORK_TIMEOUT * 2)
+            return self.token if self.valid() else None
+
+    def refresh_loop(self):
+        """
+        the loop of the refresh thread, renews the token whenever a refresh is due
+        """
+
+        while True:
+
+            # waits until a refresh is due
+            with self.condition:
+                while not self.stopped and (delay := self.next_refresh - time()) > 0:
+                    self.condition.wait(delay)
+                if self.stopped:
+                    return
+                self.refreshing = True
+
+            # requests the token without holding the condition so the old token is still served
+            start = perf_counter()
+            try:
+                response = self.request()
+            except:
+                response = {}
+            elapsed = perf_counter() - start
+
+            with self.condition:
+                self.refreshing = False
+                self.attempts += 1
+                self.total_time += elapsed
+                self.max_time = max(self.max_time, elapsed)
+
+                # stores the new token
+                if response.get("access_token"):
+                    self.cache.token = response
+                    self.token = response["access_token"]
+                    self.expires = time() + response["expires_in"] - 60  # matches the expiry of the cached token
+                    self.next_refresh = max(self.expires - TokenRefresher.REFRESH_AHEAD, (time() + self.expires) / 2)  # short lived tokens
+                    self.failures = 0
+
+                # backs off without replacing the old token
+                else:
+                    delay, max_delay = TokenRefresher.RETRY_BACKOFF
+                    self.next_refresh = time() + min(delay * 2 ** self.failures, max_delay)
+                    self.failures += 1
+                    self.failed += 1
+                self.condition.notify_all()
+
+    @property
+    def metrics(self):
+        """
+        @return a dictionary of the number of refreshes, failed refreshes, average and slowest refresh milliseconds
+            and the seconds until the token expires
+        """
+
+        with self.condition:
+            return {
+                "refreshes": self.attempts,
+                "failed": self.failed,
+                "average_ms": round(self.total_time / self.attempts * 1000, 1) if self.attempts else 0,
+                "max_ms": round(self.max_time * 1000, 1),
+                "expires_in": round(self.expires - time()) if self.valid() else 0
+            }
+
+    def stop(self):
+        """
+        stops the refresh thread and wakes any waiting jobs
+        """
+
+        with self.condition:
+            self.stopped = True
+            self.condition.notify_all()
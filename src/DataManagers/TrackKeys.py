@@ -0,0 +1,100 @@
+from unicodedata import normalize, combining
+from re import compile, IGNORECASE
+
+
+class TrackKeys:
+    """
+    a class to normalize track metadata so that the same track is found
+    regardless of casing, accents, punctuation or spacing
+
+    fuzzy keys additionally ignore featured artists, remaster/edition suffixes and word order
+    so near identical metadata maps to the same key
+    """
+
+    # suffixes that do not change the album art, ie "(feat. x)", "- Remastered 2011", "[Deluxe Edition]"
+    SUFFIXES = compile(
+        r"[(\[][^)\]]*\b(feat|ft|featuring|with|remaster(ed)?|deluxe|edition|expanded|anniversary|bonus|explicit|clean|mono|stereo)\b[^)\]]*[)\]]"
+        r"|\s-\s.*\b(remaster(ed)?|edit|version|mix|mono|stereo)\b.*$"
+        r"|\s(feat|ft|featuring)\b.*$",
+        IGNORECASE
+    )
+
+    @staticmethod
+    def normalize(text):
+        """
+        normalizes a piece of metadata
+
+        @param text: the text to normalize
+
+        @return the text in lowercase without accents and with all punctuation replaced by single spaces
+        """
+
+        text = "".join(c for c in normalize("NFKD", text or "") if not combining(c)).casefold()
+        return " ".join("".join(c if c.isalnum() else " " for c in text).split())
+
+    @staticmethod
+    def first_artist(artist):
+        """
+        @param artist: the artist metadata of a track, which can contain several artists
+
+        @return the normalized name of the first artist
+        """
+
+        return TrackKeys.normalize((artist or "").split(",")[0].split(";")[0])
+
+    @staticmethod
+    def song(title, artist):
+        """
+        @param title: the title of the track
+        @param artist: the artist of the track
+
+        @return the normalized key of the song
+        """
+
+        return f"{TrackKeys.normalize(title)}\n{TrackKeys.first_artist(artist)}"
+
+    @staticmethod
+    def album(album, artist):
+        """
+        @param album: the album of the track
+        @param artist: the artist of the track
+
+        @return the normalized key of the album
+        """
+
+        return f"{TrackKeys.normalize(album)}\n{TrackKeys.first_artist(artist)}"
+
+    @staticmethod
+    def fuzzy(text):
+        """
+        normalizes a piece of metadata and removes the parts that do not affect the album art
+
+        @param text: the text to normalize
+
+        @return the normalized words without suffixes in sorted order
+        """
+
+        stripped = TrackKeys.SUFFIXES.sub("", text or "")
+        return " ".join(sorted(TrackKeys.normalize(stripped or text).split()))
+
+    @staticmethod
+    def fuzzy_song(title, artist):
+        """
+        @param title: the title of the track
+        @param artist: the artist of the track
+
+        @return the fuzzy key of the song
+        """
+
+        return f"songs:{TrackKeys.fuzzy(title)}\n{TrackKeys.first_artist(artist)}"
+
+    @staticmethod
+    def fuzzy_album(album, artist):
+        """
+        @param album: the album of the track
+        @param artist: the artist of the track
+
+        @return the fuzzy key of the album
+        """
+
+        return f"albums:{TrackKeys.fuzzy(album)}\n{TrackKeys.first_artist(artist)}"
@@ -0,0 +1,142 @@
+from DataManagers.SampleBuffer import SampleBuffer
+from numpy import frombuffer, float64, concatenate
+from struct import Struct
+from threading import Lock
+from time import time, strftime, localtime
+from os import makedirs, listdir, remove
+from os.path import join
+
+
+class TripRecorder:
+    """
+    a class to record obd samples for a trip. the recent samples of each pid are held in memory
+    for the live readings and the samples are periodically appended to a binary file for the trip history
+
+    trip files are stored in AppData/trips and are made of blocks appended one after another:
+        name length (1 byte) | sample count (4 bytes) | name | times (8 bytes each) | values (8 bytes each)
+    so a trip cut short by a power loss only loses the samples since the last flush
+    """
+
+    DIRECTORY = "AppData/trips"
+    BLOCK = Struct("<BI")
+    CAPACITY = 4096  # samples held in memory per pid, about 7 minutes at 10 samples per second
+    FLUSH_INTERVAL = 30  # seconds between writes to the trip file
+    MAX_TRIPS = 100  # the oldest trip files are deleted when there are more than this many
+
+    def __init__(self):
+        """
+        initializes the recorder, the trip file is created when the first samples are flushed
+        """
+
+        self.buffers = {}
+        self.totals = {}  # pid: [sample count, sum of values] over the whole trip
+        self.path = None
+        self.file = None
+        self.last_flush = time()
+        self.lock = Lock()
+
+    def record(self, pid, sample_time, value):
+        """
+        records a sample and flushes the samples to the trip file if enough time has passed
+
+        @param pid: the name of the pid
+        @param sample_time: the time of the sample in seconds since the epoch
+        @param value: the value of the sample
+        """
+
+        if (buffer := self.buffers.get(pid)) is None:
+            buffer = self.buffers[pid] = SampleBuffer(TripRecorder.CAPACITY)
+            self.totals[pid] = [0, 0.0]
+        buffer.append(sample_time, value)
+        self.totals[pid][0] += 1
+        self.totals[pid][1] += value
+
+        if time() - self.last_flush >= TripRecorder.FLUSH_INTERVAL:
+            self.flush()
+
+    def window(self, pid, seconds=None):
+        """
+        @param pid: the name of the pid
+        @param seconds: how many seconds of samples to get, None for every sample held in memory
+
+        @return a tuple of the times and values arrays of the pid in chronological order
+        """
+
+        if (buffer := self.buffers.get(pid)) is None:
+            return frombuffer(b"", float64), frombuffer(b"", float64)
+        return buffer.window(seconds)
+
+    @property
+    def averages(self):
+        """
+        @return a dictionary of each pid to the average of its values over the whole trip
+        """
+
+        return {pid: total / count for pid, (count, total) in list(self.totals.items()) if count}
+
+    def flush(self):
+        """
+        appends the samples recorded since the last flush to the trip file
+        """
+
+        with self.lock:
+            self.last_flush = time()
+
+            # creates the trip file and removes the oldest trips
+            if self.file is None:
+                makedirs(TripRecorder.DIRECTORY, exist_ok=True)
+                self.path = join(TripRecorder.DIRECTORY, strftime("%Y-%m-%d_%H-%M-%S", localtime()) + ".trip")
+                self.file = open(self.path, "ab")
+                for old in sorted(listdir(TripRecorder.DIRECTORY))[:-TripRecorder.MAX_TRIPS]:
+                    remove(join(TripRecorder.DIRECTORY, old))
+
+            # writes a block for each pid with new samples
+            for pid, buffer in list(self.buffers.items()):
+                times, values = buffer.unflushed()
+                if len(times):
+                    name = pid.encode()
+                    self.file.write(TripRecorder.BLOCK.pack(len(name), len(times)) + name + times.tobytes() + values.tobytes())
+            self.file.flush()
+
+    @staticmethod
+    def read(path):
+        """
+        reads a trip file
+
+        @param path: the path of the trip file
+
+        @return a dictionary of each pid to a tuple of its times and values arrays in chronological order
+        """
+
+        with open(path, "rb") as f:
+            data = f.read()
+
+        # reads the blocks, a block cut short by a power loss is ignored
+        blocks = {}
+        offset = 0
+        while offset + TripRecorder.BLOCK.size <= len(data):
+            name_length, count = TripRecorder.BLOCK.unpack_from(data, offset)
+            offset += TripRecorder.BLOCK.size
+            end = offset + name_length + count * 16
+            if end > len(data):
+                break
+            pid = data[offset:offset + name_length].decode()
+            offset += name_length
+            times = frombuffer(data, float64, count, offset)
+            values = frombuffer(data, float64, count, offset + count * 8)
+            blocks.setdefault(pid, []).append((times, values))
+            offset = end
+
+        return {pid: (concatenate([t for t, _ in parts]), concatenate([v for _, v in parts])) for pid, parts in blocks.items()}
+
+    def close(self):
+        """
+        flushes the remaining samples and closes the trip file
+        """
+
+        if any(buffer.count > buffer.flushed for buffer in self.buffers.values()):
+            self.flush()
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
@@ -174,9 +174,8 @@ class MapsMenu(CTkFrame):
         # reads saved routes from file - note after is used here so window doesn't resize, not sure why it happens
         self.after(0, lambda: self.populate_destinations(self.saved_destinations_container, [{"display_name": k, **v} for k, v in RouteManager.routes["saved"].items()]))
         if "current" in RouteManager.routes:
-            route = RouteManager(**RouteManager.routes["current"], audio_api=self.audio_api)
-            self.map_widget.set_POI(route)
-            self.after(0, self.start_navigation)
+            current = RouteManager.routes["current"]
+            self.fg_job_manager.queue_routing((current["lat"], current["lon"]), lambda d, n: self.after(0, lambda: self.resume_navigation(current, n)))
 
     # ================================================ API COMMUNICATION ===============================================
 
@@ -245,12 +244,46 @@ class MapsMenu(CTkFrame):
         self.save_destination_popup.place_forget()
         self.delete_destination_popup.place_forget()
         self.saved_destination_name.delete(0, "end")
-        waypoint = loads(self.selected_waypoint.get())
-        route = RouteManager(waypoint["display_name"], float(waypoint["lat"]), float(waypoint["lon"]), self.audio_api)
+        self.start_navigation_button.configure(state="disabled")
+        self.manage_saved_destinations_button.configure(state="disabled")
+
+        # routes in the background, ignoring the route if another destination was selected while waiting
+        selected = self.selected_waypoint.get()
+        waypoint = loads(selected)
+        self.fg_job_manager.queue_routing(
+            (float(waypoint["lat"]), float(waypoint["lon"])),
+            lambda d, n: self.after(0, lambda: self.show_route(waypoint, n) if self.selected_waypoint.get() == selected else None)
+        )
+
+    def show_route(self, waypoint, navigation):
+        """
+        shows the route to the selected destination once the routing job is done
+
+        @param waypoint: the selected destination
+        @param navigation: the route from the routing job or None if routing failed
+        """
+
+        if navigation is None:
+            return
+        route = RouteManager(waypoint["display_name"], float(waypoint["lat"]), float(waypoint["lon"]), self.audio_api, navigation)
         self.start_navigation_button.configure(state="normal")
         self.manage_saved_destinations_button.configure(state="normal")
         self.map_widget.set_POI(route)
 
+    def resume_navigation(self, current, navigation):
+        """
+        resumes the route that was active when the app was closed once the routing job is done
+
+        @param current: the saved current route
+        @param navigation: the route from the routing job or None if routing failed
+        """
+
+        if navigation is None or self.active_route:
+            return
+        route = RouteManager(**current, audio_api=self.audio_api, navigation=navigation)
+        self.map_widget.set_POI(route)
+        self.start_navigation()
+
     def manage_saved_routes(self):
         """
         opens the respective popup window for saving/deleting a destination
@@ -1,5 +1,6 @@
 from Connections.GPIOAPI import GPIOAPI
 from Connections.ReleaseAPI import ReleaseAPI
+from Connections.AsyncHTTP import AsyncHTTP
 from customtkinter import CTk, CTkProgressBar, CTkFrame, StringVar, set_widget_scaling
 from DataManagers.AppearanceManager import AppearanceManager
 from AppData import PI_WIDTH, PI_HEIGHT
@@ -172,4 +173,5 @@ class MenuManager(CTk):
         self.audio_api.shutdown()
         self.fg_job_manager.shutdown(cancel_futures=True, wait=False)
         self.bg_job_manager.shutdown(self)
+        AsyncHTTP.close()
         super().destroy()
@@ -2,6 +2,9 @@ from customtkinter import CTkFrame, CTkLabel, DoubleVar, CTkScrollableFrame, set
 from Dev.TSCTkButton import TSCTkButton
 from Dev.PWCTkButton import PWCTkButton
 from DataManagers.MileManager import MileManger
+from DataManagers.OBDSnapshot import OBDSnapshot
+from UI.Widgets.Gauge import Gauge
+from AppData import FPS, OBD_GAUGES
 from threading import Thread
 
 
@@ -10,6 +13,9 @@ class OBDMenu(CTkFrame):
     OBD scanner menu for the 4runner dashboard
     """
 
+    FPS = int(1000 / min(FPS, 30))  # the gauges are drawn at up to 30 fps
+    GAUGE_COLUMNS = 3
+
     def __init__(self, master, appearance_manager, job_manager, **kwargs):
         """
         Initializes the settings menu frame.
@@ -34,17 +40,33 @@ class OBDMenu(CTkFrame):
 
         # creates toplevel widgets
         main_menu = TSCTkButton(self, text="Main Menu", font=("Arial", 20), command=lambda: master.change_menu("main"))
-        get_codes_button = TSCTkButton(self, text="Get Codes", font=("Arial", 20), command=self.get_codes)
+        buttons_container = CTkFrame(self, fg_color=self.cget("fg_color"))
+        self.gauges_button = TSCTkButton(buttons_container, text="Gauges", font=("Arial", 20), command=self.toggle_gauges)
+        get_codes_button = TSCTkButton(buttons_container, text="Get Codes", font=("Arial", 20), command=self.get_codes)
         container = CTkFrame(self, fg_color=self.cget("fg_color"))
+        self.gauges_container = CTkFrame(self, fg_color=self.cget("fg_color"))
         main_menu.grid(row=0, column=1, columnspan=7, pady=(10, 0), sticky="new")
-        get_codes_button.grid(row=2, column=1, columnspan=7, pady=(0, 10), sticky="sew")
+        buttons_container.grid(row=2, column=1, columnspan=7, pady=(0, 10), sticky="sew")
+        self.gauges_button.grid(row=0, column=0, padx=(0, 5), sticky="ew")
+        get_codes_button.grid(row=0, column=1, padx=(5, 0), sticky="ew")
+        buttons_container.columnconfigure((0, 1), weight=1, uniform="buttons")
         container.grid(row=1, column=1, columnspan=7, sticky="nsew", pady=10)
+        self.gauges_container.grid(row=1, column=1, columnspan=7, sticky="nsew", pady=10)
+        self.gauges_container.grid_remove()
+        self.container = container
+        self.gauges = None  # created the first time the gauges are shown
+        self.diagnostics_future = None
 
-        # creates vars to hold obd data and binds them to the API
+        # creates vars to hold obd data, they are updated from the snapshot each frame while the menu is shown
         mpg = DoubleVar(self)
+        trip_mpg = DoubleVar(self)
         miles_until_empty = DoubleVar(self)
+        self.vars = {"mpg": mpg, "trip_mpg": trip_mpg, "miles_until_empty": miles_until_empty}
+        self.snapshot = OBDSnapshot()
+        self.snapshot_version = 0
+        self.fps_counter = None
         self.api = None
-        self.api_thread = Thread(target=lambda: self.load_api(mpg, miles_until_empty))
+        self.api_thread = Thread(target=self.load_api)
         self.api_thread.start()
 
         # creates widgets for mpg
@@ -57,6 +79,16 @@ class OBDMenu(CTkFrame):
         mpg_label.pack(side="right", pady=5)
         mpg_container.pack(fill="x", padx=10, expand=True)
 
+        # creates widgets for trip mpg
+        trip_mpg_container = CTkFrame(container)
+        trip_mpg_label = CTkLabel(trip_mpg_container, text="Trip Miles Per Gallon:", font=("Arial", 20))
+        trip_mpg_label.pack(side="left", padx=10, pady=5)
+        spacer = TSCTkButton(trip_mpg_container, text="", fg_color="transparent", width=70, hover=False)
+        spacer.pack(side="right", padx=10, pady=5)
+        trip_mpg_label = CTkLabel(trip_mpg_container, textvariable=trip_mpg, font=("Arial", 20))
+        trip_mpg_label.pack(side="right", pady=5)
+        trip_mpg_container.pack(fill="x", padx=10, expand=True)
+
         # creates widgets for miles until empty
         miles_until_empty_container = CTkFrame(container)
         miles_until_empty_label = CTkLabel(miles_until_empty_container, text="Miles Until Empty:", font=("Arial", 20))
@@ -125,46 +157,170 @@ class OBDMenu(CTkFrame):
         self.codes_popup.columnconfigure(1, weight=1)
         self.codes_container.columnconfigure(1, weight=1)
 
-    def load_api(self, mpg, miles_until_empty):
+    def load_api(self):
         """
         loads the OBD scanner asynchronously for UI performance
         """
 
         from Connections.OBDAPI import OBDAPI
-        self.api = OBDAPI(
-            self,
-            self.job_manager,
-            lambda m: self.after(0, lambda: mpg.set(m)),
-            lambda e: self.after(0, lambda: miles_until_empty.set(e)),
-        )
+        self.api = OBDAPI(self, self.job_manager, self.snapshot)
+
+    def update_loop(self):
+        """
+        updates the obd data widgets each frame from the latest snapshot, skipping frames with no new values
+        """
+
+        version, values = self.snapshot.latest
+        showing_gauges = self.gauges is not None and self.gauges_container.winfo_ismapped()
+        if version != self.snapshot_version:
+            self.snapshot_version = version
+            for name, var in self.vars.items():
+                if name in values and var.get() != values[name]:
+                    var.set(values[name])
+            if showing_gauges:
+                for name, gauge in self.gauges.items():
+                    if name in values:
+                        gauge.set(values[name])
+
+        # moves the needles that have not settled
+        if showing_gauges:
+            for gauge in self.gauges.values():
+                gauge.step()
+        self.fps_counter = self.after(OBDMenu.FPS, self.update_loop)
+
+    def toggle_gauges(self):
+        """
+        switches between the readings and the gauges, the gauges are created the first time they are shown
+        """
+
+        # shows the readings
+        if self.gauges_container.winfo_ismapped():
+            self.gauges_container.grid_remove()
+            self.container.grid()
+            self.gauges_button.configure(text="Gauges")
+            return
+
+        # creates the gauges from the app settings
+        if self.gauges is None:
+            self.gauges = {}
+            for i, (name, (label, minimum, maximum, unit)) in enumerate(OBD_GAUGES.items()):
+                gauge = Gauge(self.gauges_container, label, minimum, maximum, unit, width=1, height=1)
+                gauge.grid(row=i // OBDMenu.GAUGE_COLUMNS, column=i % OBDMenu.GAUGE_COLUMNS, sticky="nsew", padx=5, pady=5)
+                self.gauges[name] = gauge
+            self.gauges_container.rowconfigure(tuple(range(max(1, -(-len(self.gauges) // OBDMenu.GAUGE_COLUMNS)))), weight=1, uniform="gauges")
+            self.gauges_container.columnconfigure(tuple(range(OBDMenu.GAUGE_COLUMNS)), weight=1, uniform="gauges")
+
+        # shows the gauges with the latest values
+        self.container.grid_remove()
+        self.gauges_container.grid()
+        self.gauges_button.configure(text="Readings")
+        self.snapshot_version = 0
+
+    def place(self, **kwargs):
+        """
+        overrides the place method to start the fps counter
+
+        :param kwargs: the kwargs to pass to the super call
+        """
+
+        super().place(**kwargs)
+        if self.fps_counter is None:
+            self.update_loop()
+
+    def place_forget(self):
+        """
+        overrides the place forget method to stop the fps counter
+        """
+
+        if self.fps_counter is not None:
+            self.after_cancel(self.fps_counter)
+            self.fps_counter = None
+        super().place_forget()
 
     def get_codes(self):
         """
-        gets the diagnostic trouble codes (DTCs) from the OBD-II interface and displays them in the UI
+        shows the codes popup and reads the diagnostic trouble codes (DTCs) in the background
         """
 
-        # places popup and clears old codes
-        self.api_thread.join()
         self.codes_popup.place(relx=.5, rely=.5, relwidth=.75, relheight=.75, anchor="center")
         set_widget_scaling(self.appearance_manager.scaling)
+        self.run_diagnostics(False)
+
+    def clear_codes(self):
+        """
+        clears the diagnostic trouble codes (DTCs) in the background and reads them again
+        """
+
+        self.run_diagnostics(True)
+
+    def run_diagnostics(self, clear):
+        """
+        queues a background job to read the codes, the popup shows the progress of the job until the codes are read
+
+        @param clear: if the codes are cleared before reading them
+        """
+
+        # only one diagnostics job runs at a time
+        if self.diagnostics_future is not None and not self.diagnostics_future.done():
+            return
+        self.show_diagnostics_status("Connecting to the OBD scanner...")
+
+        # reads the codes once the obd api has loaded
+        def job():
+            self.api_thread.join()
+            return self.api.read_diagnostics(lambda text: self.after(0, lambda: self.show_diagnostics_status(text)), clear)
+
+        self.diagnostics_future = self.job_manager.queue_obd_job(job)
+        self.diagnostics_future.add_done_callback(lambda f: self.after(0, lambda: self.show_diagnostics(f.result() if not f.exception() else None)))
+
+    def show_diagnostics_status(self, text):
+        """
+        replaces the contents of the codes popup with a status message
+
+        @param text: the status message
+        """
+
         for widget in self.codes_container.winfo_children():
             widget.destroy()
+        status = CTkLabel(self.codes_container, text=text, font=("Arial", 14))
+        status.grid(row=0, column=0, columnspan=2, pady=10)
 
-        # gets the new codes and populates the container
-        wraplength = 560 * (1 / self.appearance_manager.scaling)
-        for row, (code, description) in enumerate(self.api.get_codes()):
-            code = CTkLabel(self.codes_container, text=code, font=("Arial", 10))
-            description = CTkLabel(self.codes_container, text=description, font=("Arial", 10), wraplength=wraplength, justify="left")
-            code.grid(row=row, column=0, padx=10)
-            description.grid(row=row, column=1, sticky="w", padx=(25, 0))
-
-    def clear_codes(self):
+    def show_diagnostics(self, diagnostics):
         """
-        clears the diagnostic trouble codes (DTCs) from the OBD-II interface
+        populates the codes popup with the codes and freeze frame that were read
+
+        @param diagnostics: the dictionary from OBDAPI.read_diagnostics or None if the codes could not be read
         """
 
-        self.api.clear_codes()
-        self.get_codes()
+        if diagnostics is None:
+            self.show_diagnostics_status("Could not read codes, is the car on?")
+            return
+        for widget in self.codes_container.winfo_children():
+            widget.destroy()
+
+        # adds a section of rows to the container
+        wraplength = 560 * (1 / self.appearance_manager.scaling)
+        row = 0
+        def add_section(title, rows, empty):
+            nonlocal row
+            header = CTkLabel(self.codes_container, text=title, font=("Arial", 14))
+            header.grid(row=row, column=0, columnspan=2, sticky="w", padx=10, pady=(5, 0))
+            row += 1
+            for code, description in rows or [("", empty)]:
+                code = CTkLabel(self.codes_container, text=code, font=("Arial", 10))
+                description = CTkLabel(self.codes_container, text=description, font=("Arial", 10), wraplength=wraplength, justify="left")
+                code.grid(row=row, column=0, padx=10)
+                description.grid(row=row, column=1, sticky="w", padx=(25, 0))
+                row += 1
+
+        # populates the codes and the freeze frame
+        for kind in ("stored", "pending", "permanent"):
+            codes = diagnostics[kind]
+            add_section(f"{kind.title()} Codes", codes, f"No {kind} codes" if codes is not None else f"Could not read {kind} codes")
+        if (frame := diagnostics["freeze_frame"]) is not None:
+            add_section(f"Freeze Frame ({frame['code'][0]})", [(value, description) for description, value in frame["values"]], "No freeze frame data")
+        if diagnostics["history"]:
+            add_section("Code History", [(code, f"{entry['description']}\nlast seen {entry['last_seen']} at {entry['last_seen_miles']:,} miles" + (f", cleared {entry['cleared']} at {entry['cleared_miles']:,} miles" if entry["cleared"] else "")) for code, entry in diagnostics["history"]], "")
 
     def destroy(self):
         """
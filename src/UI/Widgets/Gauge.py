@@ -0,0 +1,229 @@
+from tkinter import Canvas
+from customtkinter import AppearanceModeTracker, ThemeManager
+from PIL.Image import new as new_img, Resampling
+from PIL.ImageDraw import Draw
+from PIL.ImageFont import load_default
+from PIL.ImageTk import PhotoImage
+from math import radians, cos, sin
+
+
+class Gauge(Canvas):
+    """
+    a round dial for a live obd value.
+
+    the face (track, ticks and labels) is rendered once per size and color scheme with PIL and shared by every gauge,
+    each frame only moves the needle line and changes the value text so drawing a frame costs a couple of canvas updates.
+    the needle eases towards new values so it moves smoothly between samples and is not redrawn once it settles
+    """
+
+    START = 225  # degrees of the minimum value, counter clockwise from 3 o'clock
+    SWEEP = 270  # degrees from the minimum to the maximum value
+    TICKS = 10  # labeled ticks
+    MINOR_TICKS = 5  # ticks per labeled tick
+    SUPERSAMPLE = 2  # the face is drawn larger and scaled down to smooth the edges
+    EASING = .35  # fraction of the distance to the new value the needle moves each frame
+    MIN_STEP = .002  # fraction of the dial the needle must move to be redrawn
+    NEEDLE_COLOR = "#E04030"
+    MAX_FACES = 32
+
+    # class fields
+    faces = {}  # pre-rendered faces shared by every gauge
+
+    def __init__(self, master, label, minimum, maximum, unit, **kwargs):
+        """
+        creates the gauge, the face is rendered when the gauge is first sized
+
+        @param master: the parent widget, the background of the gauge matches it
+        @param label: the name shown on the face
+        @param minimum: the value at the start of the dial
+        @param maximum: the value at the end of the dial
+        @param unit: the unit shown after the value
+        @param kwargs: additional keyword arguments for the canvas
+        """
+
+        super().__init__(master, highlightthickness=0, bd=0, **kwargs)
+        self.label = label
+        self.minimum = minimum
+        self.maximum = maximum
+        self.unit = unit
+        self.decimals = 1 if maximum - minimum < 50 else 0
+        self.size = 0
+        self.photo = None
+        self.value = None
+        self.target = None  # the fraction of the dial the needle is moving to
+        self.shown = None  # the fraction of the dial the needle is drawn at
+        self.text_shown = None
+
+        # creates the items that change each frame above the face
+        self.face = self.create_image(0, 0, anchor="nw")
+        self.needle = self.create_line(0, 0, 0, 0, fill=Gauge.NEEDLE_COLOR, capstyle="round")
+        self.hub = self.create_oval(0, 0, 0, 0, fill=Gauge.NEEDLE_COLOR, outline="")
+        self.text = self.create_text(0, 0, text="--")
+
+        self.bind("<Configure>", lambda e: self.resize(e.width, e.height))
+        AppearanceModeTracker.add(self.update_appearance_mode)
+
+    def color(self, color):
+        """
+        @param color: a color or a (light, dark) pair of colors from the theme
+
+        @return the rgb tuple of the color for the current appearance mode
+        """
+
+        if isinstance(color, (tuple, list)):
+            color = color[AppearanceModeTracker.appearance_mode]
+        return tuple(channel // 257 for channel in self.winfo_rgb(color))
+
+    def colors(self):
+        """
+        @return a tuple of the background, track, accent and text colors of the current theme and appearance mode
+        """
+
+        theme = ThemeManager.theme
+        background = self.master.cget("fg_color")
+        if background == "transparent":
+            background = theme["CTkFrame"]["fg_color"]
+        return (
+            self.color(background),
+            self.color(theme["CTkProgressBar"]["fg_color"]),
+            self.color(theme["CTkButton"]["fg_color"]),
+            self.color(theme["CTkLabel"]["text_color"])
+        )
+
+    def render_face(self, colors):
+        """
+        renders the face of the gauge, or reuses a face already rendered for another gauge
+
+        @param colors: the colors from the colors method
+
+        @return the face image
+        """
+
+        key = (self.size, self.label, self.minimum, self.maximum, colors)
+        if (face := Gauge.faces.get(key)) is not None:
+            return face
+
+        # draws the track
+        background, track, accent, text = colors
+        size = self.size * Gauge.SUPERSAMPLE
+        center, radius, width = size / 2, size * .45, size * .05
+        image = new_img("RGB", (size, size), background)
+        draw = Draw(image)
+        box = (center - radius, center - radius, center + radius, center + radius)
+        draw.arc(box, -Gauge.START, Gauge.SWEEP - Gauge.START, fill=track, width=round(width))
+
+        # draws the ticks and labels, large values are labeled in thousands
+        font = load_default(size * .06)
+        scale = 1000 if self.maximum >= 1000 else 1
+        ticks = Gauge.TICKS * Gauge.MINOR_TICKS
+        for i in range(ticks + 1):
+            fraction = i / ticks
+            angle = radians(Gauge.START - fraction * Gauge.SWEEP)
+            major = i % Gauge.MINOR_TICKS == 0
+            outer, inner = radius - width * 1.2, radius - width * 1.2 - size * (.07 if major else .035)
+            draw.line((center + outer * cos(angle), center - outer * sin(angle), center + inner * cos(angle), center - inner * sin(angle)), fill=accent if major else track, width=round(size * (.012 if major else .006)))
+            if major:
+                value = (self.minimum + fraction * (self.maximum - self.minimum)) / scale
+                label = radius - width * 1.2 - size * .13
+                draw.text((center + label * cos(angle), center - label * sin(angle)), f"{round(value, 1 if scale > 1 else self.decimals):g}", fill=text, font=font, anchor="mm")
+        draw.text((center, center + size * .13), self.label + (" x1000" if scale > 1 else ""), fill=text, font=font, anchor="mm")
+
+        # scales the face down to smooth it
+        face = image.resize((self.size, self.size), Resampling.LANCZOS)
+        if len(Gauge.faces) >= Gauge.MAX_FACES:
+            Gauge.faces.clear()
+        Gauge.faces[key] = face
+        return face
+
+    def draw_face(self):
+        """
+        shows the face for the current size and colors and recolors the items above it
+        """
+
+        colors = self.colors()
+        self.photo = PhotoImage(self.render_face(colors), master=self)
+        self.itemconfigure(self.face, image=self.photo)
+        self.itemconfigure(self.text, fill="#%02x%02x%02x" % colors[3])
+        self.configure(bg="#%02x%02x%02x" % colors[0])
+
+    def resize(self, width, height):
+        """
+        fits the gauge to a new size
+
+        @param width: the width of the canvas
+        @param height: the height of the canvas
+        """
+
+        size = min(width, height)
+        if size < 10:
+            return
+        self.size = size
+        x, y = (width - size) / 2, (height - size) / 2
+        self.center = (x + size / 2, y + size / 2)
+
+        # moves the items to the new size
+        self.coords(self.face, x, y)
+        self.itemconfigure(self.needle, width=max(2, round(size * .025)))
+        self.coords(self.hub, self.center[0] - size * .04, self.center[1] - size * .04, self.center[0] + size * .04, self.center[1] + size * .04)
+        self.coords(self.text, self.center[0], self.center[1] + size * .27)
+        self.itemconfigure(self.text, font=("Arial", -round(size * .1)))
+        self.draw_face()
+        self.shown = None
+        self.step()
+
+    def update_appearance_mode(self, mode):
+        """
+        redraws the face in the colors of the new appearance mode
+
+        @param mode: the new appearance mode
+        """
+
+        if self.size:
+            self.after(0, self.draw_face)  # the theme colors of the master are updated first
+
+    def set(self, value):
+        """
+        sets the value the needle moves to, the gauge is redrawn on the next step
+
+        @param value: the new value
+        """
+
+        self.value = value
+        self.target = min(max((value - self.minimum) / (self.maximum - self.minimum), 0), 1)
+
+    def step(self):
+        """
+        moves the needle towards the value, must be called each frame
+
+        @return if anything was redrawn
+        """
+
+        if self.target is None or not self.size:
+            return False
+
+        # eases the needle and skips drawing movements too small to see
+        shown = self.target if self.shown is None else self.shown + (self.target - self.shown) * Gauge.EASING
+        if abs(self.target - shown) < Gauge.MIN_STEP * 3:
+            shown = self.target
+        text = f"{self.value:.{self.decimals}f} {self.unit}"
+        if self.shown is not None and abs(shown - self.shown) < Gauge.MIN_STEP / 2 and text == self.text_shown:
+            return False
+
+        # moves the needle and changes the text only when it changed
+        self.shown = shown
+        angle = radians(Gauge.START - shown * Gauge.SWEEP)
+        tip, tail = self.size * .38, self.size * .06
+        x, y = self.center
+        self.coords(self.needle, x - tail * cos(angle), y + tail * sin(angle), x + tip * cos(angle), y - tip * sin(angle))
+        if text != self.text_shown:
+            self.text_shown = text
+            self.itemconfigure(self.text, text=text)
+        return True
+
+    def destroy(self):
+        """
+        overrides the destroy method to stop tracking the appearance mode
+        """
+
+        AppearanceModeTracker.remove(self.update_appearance_mode)
+        super().destroy()
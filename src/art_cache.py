@@ -0,0 +1,77 @@
+from argparse import ArgumentParser
+
+
+def export_cache(args):
+    """
+    writes the album art cache to an archive
+
+    @param args: the parsed command line arguments
+    """
+
+    from DataManagers.AlbumArtCache import AlbumArtCache  # lazy loaded for performance
+    cache = AlbumArtCache(None)
+    try:
+        songs, albums = cache.export_bundle(args.path)
+        print(f"exported {songs} songs and {albums} albums to {args.path}")
+    finally:
+        cache.shutdown()
+
+
+def import_cache(args):
+    """
+    restores the album art cache from an archive
+
+    @param args: the parsed command line arguments
+    """
+
+    from DataManagers.AlbumArtCache import AlbumArtCache  # lazy loaded for performance
+    cache = AlbumArtCache(None)
+    try:
+        songs, albums = cache.import_bundle(args.path)
+        print(f"imported {songs} songs and {albums} albums from {args.path}")
+    finally:
+        cache.shutdown()
+
+
+def warm_cache(args):
+    """
+    fills the album art cache from a track list file
+
+    @param args: the parsed command line arguments
+    """
+
+    # lazy loaded for performance
+    from DataManagers.BGJobManager import BGJobManager
+    from DataManagers.CacheWarmer import CacheWarmer
+
+    tracks = CacheWarmer.read_tracks(args.tracks)
+    manager = BGJobManager(startup_jobs=False)
+    try:
+        warmer = CacheWarmer(manager, args.workers)
+        results = warmer.warm(tracks, lambda i, track, result: print(f"[{i}/{len(tracks)}] {result}: {track[1]} - {track[0]}"))
+        print(", ".join(f"{count} {result}" for result, count in results.items()))
+    finally:
+        manager.shutdown()
+
+
+if __name__ == "__main__":
+
+    # must be run from the src directory since the cache is stored in AppData
+    parser = ArgumentParser(description="backs up, restores and warms the album art cache")
+    commands = parser.add_subparsers(required=True)
+
+    export_parser = commands.add_parser("export", help="writes the cache to an archive")
+    export_parser.add_argument("path", help="the archive to write")
+    export_parser.set_defaults(command=export_cache)
+
+    import_parser = commands.add_parser("import", help="restores the cache from an archive written by export")
+    import_parser.add_argument("path", help="the archive to read")
+    import_parser.set_defaults(command=import_cache)
+
+    warm_parser = commands.add_parser("warm", help="looks up the album art of every track in a track list file")
+    warm_parser.add_argument("tracks", help="a playlist (.m3u) or a text file of 'artist - title' or 'title<tab>artist<tab>album' lines")
+    warm_parser.add_argument("--workers", type=int, default=4, help="the maximum number of tracks to look up at once")
+    warm_parser.set_defaults(command=warm_cache)
+
+    args = parser.parse_args()
+    args.command(args)
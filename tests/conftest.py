@@ -0,0 +1,19 @@
+from os.path import dirname, join
+from pytest import fixture
+import sys
+
+# the app is run from the src directory
+sys.path.insert(0, join(dirname(dirname(__file__)), "src"))
+
+
+@fixture
+def app_data(tmp_path, monkeypatch):
+    """
+    runs a test from an empty directory so the AppData files it creates are thrown away
+
+    @return the path of the AppData directory
+    """
+
+    (tmp_path / "AppData").mkdir()
+    monkeypatch.chdir(tmp_path)
+    return tmp_path / "AppData"
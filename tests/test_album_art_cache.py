@@ -0,0 +1,25 @@
+from pytest import importorskip
+
+importorskip("diskcache")
+importorskip("PIL")
+
+
+def test_untagged_tracks_by_the_same_artist_keep_their_own_art(app_data):
+    from DataManagers.AlbumArtCache import AlbumArtCache
+    from DataManagers.PriorityExecutor import PriorityExecutor
+    from PIL.Image import new
+
+    cache = AlbumArtCache(new("RGB", (8, 8), "black"))
+    pool = PriorityExecutor()
+    try:
+
+        # library matches of untagged files have no album name
+        cache.store("First Song", "Artist", None, new("RGB", (8, 8), "red"))
+        cache.store("Second Song", "Artist", None, new("RGB", (8, 8), "blue"))
+
+        assert cache.fetch("First Song", "Artist", None, pool).getpixel((0, 0)) == (255, 0, 0)
+        assert cache.fetch("Second Song", "Artist", None, pool).getpixel((0, 0)) == (0, 0, 255)
+        assert cache.fetch("Third Song", "Artist", None, pool) is None
+    finally:
+        pool.shutdown()
+        cache.shutdown()
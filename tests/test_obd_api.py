@@ -0,0 +1,21 @@
+from pytest import importorskip
+
+importorskip("obd")
+
+
+def test_most_overdue_unbatchable_pid_is_read_before_a_batch(app_data, monkeypatch):
+    from Connections.OBDAPI import OBDAPI
+    from obd import OBD, OBDResponse, commands
+
+    api = OBDAPI.__new__(OBDAPI)
+    api.multi_pid = True
+    api.requests = 0
+    queried = []
+    monkeypatch.setattr(OBD, "query", lambda self, command, force=False: queried.append(command) or OBDResponse(command))
+
+    # the adapter voltage is not a mode 01 pid so it can not be batched
+    ready = [commands.ELM_VOLTAGE, commands.RPM, commands.SPEED]
+    requested, _ = api.read_batch(ready)
+
+    assert requested == [commands.ELM_VOLTAGE]
+    assert queried == [commands.ELM_VOLTAGE]